@@ -0,0 +1,164 @@
+"""Нагрузочный тест HTTP/JSON API (src/server.py) по keep-alive соединениям.
+
+Сервер запускается отдельным процессом с настройками из переменных окружения.
+--concurrency клиентов отправляют записи data/test.csv: по одной в /predict
+(--batch-size 1) либо массивами в /predict_batch; выводятся пропускная
+способность, записей в секунду, перцентили задержки запроса и статусы ответов.
+
+Запуск из корневой директории репозитория:
+    python ./benchmarks/api.py --requests 5000 --concurrency 64
+    python ./benchmarks/api.py --requests 200 --batch-size 500 --workers 4 --output api.json
+"""
+import argparse
+import asyncio
+from collections import Counter
+import datetime
+import json
+import os
+import sys
+import time
+
+import aiohttp
+import numpy as np
+
+from common import MODEL_PATH, ROOT, load_records
+from models.encoder import Encoder
+
+
+async def wait_started(session: aiohttp.ClientSession, url: str, server, timeout: float) -> None:
+    """Ожидание загрузки моделей и запуска сервера."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.returncode is not None:
+            raise RuntimeError("The server exited, see its output above")
+        try:
+            async with session.get(url + "/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("The server didn't start")
+
+
+async def generate(session: aiohttp.ClientSession, url: str, records: list, args) -> tuple:
+    """--requests запросов от --concurrency клиентов;
+
+    Returns:
+        tuple: (статус, задержка, секунды) каждого запроса и общее время, секунды.
+    """
+    if args.batch_size == 1:
+        endpoint, bodies = "/predict", records
+    else:
+        endpoint = "/predict_batch"
+        bodies = [
+            [records[(i + j) % len(records)] for j in range(args.batch_size)]
+            for i in range(0, len(records), args.batch_size)
+        ]
+    params = {"explain": args.explain} if args.explain else {}
+    counter = iter(range(args.requests))
+    results = []
+
+    async def client() -> None:
+        for i in counter:
+            start = time.perf_counter()
+            async with session.post(
+                url + endpoint, json=bodies[i % len(bodies)], params=params
+            ) as response:
+                await response.read()
+                results.append((response.status, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(args.concurrency)])
+    return results, time.perf_counter() - start
+
+
+def report(results: list, elapsed: float, batch_size: int) -> dict:
+    latencies = np.array([latency for _, latency in results]) * 1e3
+    return {
+        "requests": len(results),
+        "records": len(results) * batch_size,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(results) / elapsed,
+        "records_per_s": len(results) * batch_size / elapsed,
+        "statuses": dict(Counter(str(status) for status, _ in results)),
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        },
+    }
+
+
+async def run_load(args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("MODEL_PATH", os.path.relpath(MODEL_PATH, ROOT))
+    server = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join(ROOT, "src", "server.py"),
+        "--address",
+        f"127.0.0.1:{args.port}",
+        "--workers",
+        str(args.workers),
+        cwd=ROOT,
+        env=env,
+        stdout=asyncio.subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    # одно keep-alive соединение на клиента
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_started(session, url, server, 120)
+            # id и другие лишние колонки -- неизвестные параметры для API
+            features = Encoder().get_features_dict()
+            records = [
+                {key: value for key, value in record.items() if key in features}
+                for record in load_records(args.data)
+            ]
+            results, elapsed = await generate(session, url, records, args)
+        return report(results, elapsed, args.batch_size)
+    finally:
+        if server.returncode is None:
+            server.terminate()
+            await server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "test.csv"))
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="1 - /predict, else /predict_batch"
+    )
+    parser.add_argument("--explain", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="server processes")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--output", help="json file for the results")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args))
+    latency = summary["latency_ms"]
+    print(
+        f"{summary['requests']} requests ({summary['records']} records) in "
+        f"{summary['elapsed_s']:.1f} s: {summary['requests_per_s']:.1f} requests/s, "
+        f"{summary['records_per_s']:.1f} records/s, "
+        + ", ".join(f"{name} {value:.1f} ms" for name, value in latency.items())
+    )
+    print("statuses: " + ", ".join(f"{s} {n}" for s, n in summary["statuses"].items()))
+
+    if args.output:
+        summary["meta"] = {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "args": vars(args),
+        }
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
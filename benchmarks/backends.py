@@ -0,0 +1,56 @@
+"""Сравнение задержки бэкендов модели (xgboost и compiled) на одиночных записях и малых батчах.
+
+Запуск из корневой директории репозитория:
+    python ./benchmarks/backends.py --model saved_models/xgb.pickle
+"""
+import argparse
+import os
+import time
+import warnings
+
+import numpy as np
+
+from common import MODEL_PATH, ROOT, load_records
+from models.model import Model
+
+
+def latencies(model: Model, X: np.array, batch_size: int, repeat: int) -> np.array:
+    result = []
+    for i in range(repeat):
+        start = (i * batch_size) % (len(X) - batch_size)
+        batch = X[start:start + batch_size]
+        begin = time.perf_counter()
+        model.predict_batch(batch)
+        result.append(time.perf_counter() - begin)
+    return np.array(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "test.csv"))
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    backends = {
+        name: Model.load(args.model, lazy=False, backend=name)
+        for name in ("xgboost", "compiled")
+    }
+    X, _ = backends["xgboost"].encoder.encode_records(load_records(args.data))
+
+    reference = backends["xgboost"].predict_batch(X)[1]
+    compiled = backends["compiled"].predict_batch(X)[1]
+    print(f"max |proba difference|: {np.abs(reference - compiled).max():.2e}")
+
+    for batch_size in (1, 8, 32):
+        for name, model in backends.items():
+            t = latencies(model, X, batch_size, args.repeat) * 1e6
+            print(
+                f"batch {batch_size:>3} {name:>9}: "
+                f"p50 {np.percentile(t, 50):8.0f} us, p99 {np.percentile(t, 99):8.0f} us"
+            )
+
+
+if __name__ == "__main__":
+    main()
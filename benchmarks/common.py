@@ -0,0 +1,34 @@
+"""Общие функции бенчмарков: пути и реалистичные входные данные из data/*.csv."""
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILES = (
+    os.path.join(ROOT, "data", "train.csv"),
+    os.path.join(ROOT, "data", "test.csv"),
+)
+MODEL_PATH = os.path.join(ROOT, "saved_models", "xgb.pickle")
+
+if os.path.join(ROOT, "src") not in sys.path:
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+
+
+def load_records(*paths: str) -> list:
+    """Строки csv-файлов в виде словарей, пропуски удалены (как во входе бота)."""
+    records = []
+    for path in paths or DATA_FILES:
+        df = pd.read_csv(path, dtype={"lesion_1": str})
+        records.extend(
+            {key: value for key, value in row.items() if not pd.isna(value)}
+            for row in df.to_dict("records")
+        )
+    return records
+
+
+def to_message(record: dict, features: dict) -> str:
+    """Запись в формате сообщения /process (PROCESS_DOC): key: value через запятую."""
+    return ",\n".join(
+        f"{key}: {value}" for key, value in record.items() if key in features
+    )
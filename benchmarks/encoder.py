@@ -0,0 +1,37 @@
+"""Микробенчмарк кодирования одной записи: Encoder.encode_one_record.
+
+Запуск из корневой директории репозитория:
+    python ./benchmarks/encoder.py --repeat 5
+"""
+import argparse
+import os
+import timeit
+import warnings
+
+from common import ROOT, load_records
+from models.encoder import Encoder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "test.csv"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records = load_records(args.data)
+    encoder = Encoder()
+
+    def encode_all():
+        for record in records:
+            encoder.encode_one_record(record)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        best = min(timeit.repeat(encode_all, number=1, repeat=args.repeat))
+
+    print(f"records: {len(records)}")
+    print(f"encode_one_record: {best / len(records) * 1e6:.1f} us/record")
+
+
+if __name__ == "__main__":
+    main()
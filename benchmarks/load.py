@@ -0,0 +1,298 @@
+"""Нагрузочный тест бота: синтетические диалоги через локальный поддельный Telegram Bot API.
+
+Бот (src/bot.py) запускается отдельным процессом с TELEGRAM_API_URL, указывающим
+на сервер в этом процессе, поэтому сеть и Telegram не нужны. Каждый диалог --
+отдельный чат: /process, затем сообщение с параметрами строки data/test.csv
+в формате PROCESS_DOC (key: value через запятую). Диалоги начинаются
+с постоянной интенсивностью (--rate, поток Пуассона) либо сразу, как только
+освобождается место (--rate 0); одновременно идёт не больше --concurrency диалогов.
+
+Для ответа на сообщение с параметрами измеряется задержка (от появления сообщения
+в getUpdates до sendMessage бота) и вид ответа: ok (рекомендация), parse_error
+(в data/test.csv есть строки с неверными значениями), overloaded, throttled,
+internal_error, timeout (нет ответа за --timeout секунд).
+
+Запуск из корневой директории репозитория, настройки бота -- переменными окружения:
+    python ./benchmarks/load.py --conversations 2000 --concurrency 64
+    INFERENCE_TRANSPORT=local INFERENCE_WORKERS=4 python ./benchmarks/load.py --rate 200 --output load.json
+"""
+import argparse
+import asyncio
+from collections import Counter, deque
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+from aiohttp import web
+import numpy as np
+
+from common import MODEL_PATH, ROOT, load_records, to_message
+from inference.docs import INTERNAL_ERROR, OVERLOADED, PARSE_ERROR
+from models.encoder import Encoder
+
+
+BOT_TOKEN = "123:load"
+
+
+class FakeTelegram:
+    """Поддельный Bot API: выдаёт боту сообщения через getUpdates и принимает ответы."""
+
+    def __init__(self):
+        self.updates = deque()
+        self.update_ids = itertools.count(1)
+        self.new_updates = asyncio.Event()
+        # chat_id -> future следующего ответа бота в этот чат
+        self.waiters = {}
+        # бот начал получать сообщения
+        self.polling = asyncio.Event()
+        self.unexpected = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        # telebot передает параметры в теле запроса и для GET
+        data = dict(request.query)
+        if request.can_read_body:
+            data.update(urllib.parse.parse_qsl(await request.text()))
+
+        method = request.match_info["method"]
+        if method == "getUpdates":
+            return self.__ok(await self.get_updates(data))
+        if method == "sendMessage":
+            self.reply(int(data["chat_id"]), data["text"])
+            return self.__ok(
+                {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": int(data["chat_id"]), "type": "private"},
+                    "text": data["text"],
+                }
+            )
+        if method == "getMe":
+            return self.__ok({"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"})
+        return self.__ok(True)
+
+    @staticmethod
+    def __ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    async def get_updates(self, data: dict) -> list:
+        """Long polling: ждём новых сообщений не дольше timeout запроса."""
+        self.polling.set()
+        offset = int(data.get("offset") or 0)
+        limit = int(data.get("limit") or 100)
+
+        # сообщения до offset бот уже получил
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        if not self.updates and float(data.get("timeout") or 0):
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), float(data["timeout"]))
+            except asyncio.TimeoutError:
+                pass
+        return [update for update, _ in zip(self.updates, range(limit))]
+
+    def reply(self, chat_id: int, text: str) -> None:
+        waiter = self.waiters.pop(chat_id, None)
+        if waiter is None or waiter.done():
+            self.unexpected += 1
+            return
+        waiter.set_result(text)
+
+    async def request(self, chat_id: int, text: str, timeout: float) -> str:
+        """Сообщение боту от чата и ответ бота на него."""
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id] = waiter
+
+        update_id = next(self.update_ids)
+        entities = []
+        if text.startswith("/"):
+            entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        self.updates.append(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": "user"},
+                    "text": text,
+                    "entities": entities,
+                },
+            }
+        )
+        self.new_updates.set()
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        finally:
+            self.waiters.pop(chat_id, None)
+
+
+def kind(reply: str) -> str:
+    """Вид ответа бота на сообщение с параметрами."""
+    if reply.startswith("Рекомендация"):
+        return "ok"
+    if reply.startswith(PARSE_ERROR):
+        return "parse_error"
+    if reply == OVERLOADED:
+        return "overloaded"
+    if reply.startswith("Слишком много запросов"):
+        return "throttled"
+    if reply == INTERNAL_ERROR:
+        return "internal_error"
+    return "other"
+
+
+async def conversation(api: FakeTelegram, chat_id: int, message: str, timeout: float) -> tuple:
+    """Один диалог: /process и сообщение с параметрами;
+
+    Returns:
+        tuple: вид ответа на параметры и задержка ответа, секунды (None, если ответа нет).
+    """
+    try:
+        await api.request(chat_id, "/process", timeout)
+        start = time.perf_counter()
+        reply = await api.request(chat_id, message, timeout)
+        return kind(reply), time.perf_counter() - start
+    except asyncio.TimeoutError:
+        return "timeout", None
+
+
+async def generate(api: FakeTelegram, messages: list, args) -> tuple:
+    """Запуск диалогов согласно --rate и --concurrency;
+
+    Returns:
+        tuple: результаты диалогов и время от начала первого до конца последнего диалога, секунды.
+    """
+    rng = np.random.default_rng(args.seed)
+    slots = asyncio.Semaphore(args.concurrency)
+    tasks = []
+
+    async def run(chat_id: int, message: str) -> tuple:
+        try:
+            return await conversation(api, chat_id, message, args.timeout)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    next_arrival = start
+    for i in range(args.conversations):
+        if args.rate > 0:
+            next_arrival += rng.exponential(1 / args.rate)
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        await slots.acquire()
+        # у каждого диалога свой чат, ограничение частоты одного чата не срабатывает
+        tasks.append(asyncio.create_task(run(i + 1, messages[i % len(messages)])))
+
+    results = await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+
+def report(results: list, elapsed: float, unexpected: int) -> dict:
+    kinds = Counter(result_kind for result_kind, _ in results)
+    latencies = np.array([latency for _, latency in results if latency is not None]) * 1e3
+    n = len(results)
+    summary = {
+        "conversations": n,
+        "elapsed_s": elapsed,
+        "throughput_cps": n / elapsed,
+        "replies": dict(kinds),
+        "rates": {name: count / n for name, count in kinds.items()},
+        "unexpected_replies": unexpected,
+    }
+    if len(latencies):
+        summary["latency_ms"] = {
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        }
+    return summary
+
+
+async def run_load(args) -> dict:
+    api = FakeTelegram()
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    env = dict(os.environ)
+    env.update(
+        {
+            "BOT_TOKEN": BOT_TOKEN,
+            "TELEGRAM_API_URL": f"http://127.0.0.1:{args.port}",
+            "MODEL_PATH": env.get("MODEL_PATH", os.path.relpath(MODEL_PATH, ROOT)),
+        }
+    )
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable,
+        os.path.join(ROOT, "src", "bot.py"),
+        cwd=ROOT,
+        env=env,
+        stdout=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        # загрузка модели и запуск polling
+        started = asyncio.create_task(api.polling.wait())
+        exited = asyncio.create_task(bot.wait())
+        await asyncio.wait({started, exited}, timeout=120, return_when=asyncio.FIRST_COMPLETED)
+        exited.cancel()
+        if not api.polling.is_set():
+            raise RuntimeError("The bot didn't start polling, see its output above")
+
+        features = Encoder().get_features_dict()
+        messages = [to_message(record, features) for record in load_records(args.data)]
+        results, elapsed = await generate(api, messages, args)
+        return report(results, elapsed, api.unexpected)
+    finally:
+        if bot.returncode is None:
+            bot.terminate()
+            await bot.wait()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "test.csv"))
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="new conversations per second, 0 - as fast as possible"
+    )
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="json file for the results")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args))
+    latency = summary.get("latency_ms", {})
+    print(
+        f"{summary['conversations']} conversations in {summary['elapsed_s']:.1f} s: "
+        f"{summary['throughput_cps']:.1f} conversations/s, "
+        + ", ".join(f"{name} {latency[name]:.1f} ms" for name in latency)
+    )
+    print("replies: " + ", ".join(f"{name} {rate:.1%}" for name, rate in summary["rates"].items()))
+
+    if args.output:
+        summary["meta"] = {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "args": vars(args),
+            "transport": os.environ.get("INFERENCE_TRANSPORT", "inline"),
+        }
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Память закодированных записей в режимах вывода Encoder.encode_records (dense и csr).
+
+Записи data/train.csv и data/test.csv выбираются с повторением до нужного числа.
+Для каждого режима выводится размер результата и пиковая память кодирования (tracemalloc).
+
+Запуск из корневой директории репозитория:
+    python ./benchmarks/memory.py --records 1000000
+"""
+import argparse
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from common import MODEL_PATH, load_records
+from models.encoder import CSR, DENSE
+from models.model import Model
+
+
+def size_mb(X) -> float:
+    if hasattr(X, "indptr"):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 2**20
+    return X.nbytes / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    model = Model.load(args.model, lazy=False)
+    source = load_records()
+    rng = np.random.default_rng(args.seed)
+    records = [source[i] for i in rng.integers(0, len(source), args.records)]
+
+    encoded = {}
+    for output in (DENSE, CSR):
+        tracemalloc.start()
+        start = time.perf_counter()
+        encoded[output], _ = model.encoder.encode_records(records, output, np.float32)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{output:>5}: {size_mb(encoded[output]):8.1f} MB, "
+            f"peak {peak / 2**20:8.1f} MB, {elapsed:6.1f} s"
+        )
+
+    # предсказания по обоим представлениям совпадают
+    n = min(args.records, 10000)
+    dense = model.predict_batch(encoded[DENSE][:n])[1]
+    sparse = model.predict_batch(encoded[CSR][:n])[1]
+    print(f"max |proba difference| on {n} records: {np.abs(dense - sparse).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
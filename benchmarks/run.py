@@ -0,0 +1,242 @@
+"""Бенчмарк этапов инференса: парсинг, кодирование, предсказание и обработка сообщения целиком.
+
+Входные данные -- строки data/train.csv и data/test.csv (выборка с повторением
+до нужного размера батча). Для каждого этапа и размера батча измеряются
+пропускная способность, перцентили задержки и пиковая память (tracemalloc).
+
+Запуск из корневой директории репозитория:
+    python ./benchmarks/run.py --output bench.json
+    python ./benchmarks/run.py --output new.json --compare bench.json --threshold 0.1
+    python ./benchmarks/run.py --no-metrics  # накладные расходы метрик (monitoring)
+
+Этапы:
+    parse -- inference.parser.MessageParser.parse, задержка одного сообщения;
+    parse_encode -- MessageParser.encode (парсинг сразу в закодированную запись), задержка одного сообщения;
+    encode_one_record -- Encoder.encode_one_record, задержка одной записи;
+    encode_records -- Encoder.encode_records, задержка батча;
+    predict -- Model.predict_batch на закодированном батче, задержка батча;
+    explain -- Model.explain_batch (вклад параметров, SHAP) на закодированном батче, задержка батча;
+    explain_approximate -- то же с приближенным расчетом вклада;
+    end_to_end -- inference.model_inference.process, задержка одного сообщения.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from common import MODEL_PATH, load_records, to_message
+from inference.errors import ParseError
+from inference.model_inference import process
+from inference.parser import parser_for
+from models.model import Model
+from monitoring.metrics import REGISTRY
+
+
+STAGES = (
+    "parse",
+    "parse_encode",
+    "encode_one_record",
+    "encode_records",
+    "predict",
+    "explain",
+    "explain_approximate",
+    "end_to_end",
+)
+# этапы, которые обрабатывают записи по одной
+PER_RECORD_STAGES = ("parse", "parse_encode", "encode_one_record", "end_to_end")
+
+
+def tolerant(parse):
+    """Парсинг без исключения: в данных есть строки с неверными значениями, как и во входе бота."""
+    def call(message: str):
+        try:
+            return parse(message)
+        except ParseError:
+            return None
+
+    return call
+
+
+def make_stage(stage: str, model: Model, records: list, messages: list):
+    """Подготовка входа этапа;
+
+    Returns:
+        tuple: функция без аргументов, выполняющая этап на всём батче,
+               и функция одного вызова (для задержки) -- либо None, если вызов один.
+    """
+    parser = parser_for(model)
+    encoder = model.encoder
+
+    if stage == "parse":
+        parse = tolerant(parser.parse)
+        return None, lambda i: parse(messages[i])
+    if stage == "parse_encode":
+        encode = tolerant(parser.encode)
+        return None, lambda i: encode(messages[i])
+    if stage == "encode_one_record":
+        return None, lambda i: encoder.encode_one_record(records[i])
+    if stage == "end_to_end":
+        return None, lambda i: process(model, messages[i])
+    if stage == "encode_records":
+        return lambda: encoder.encode_records(records), None
+    if stage == "predict":
+        encoded, _ = encoder.encode_records(records)
+        return lambda: model.predict_batch(encoded), None
+    if stage in ("explain", "explain_approximate"):
+        encoded, _ = encoder.encode_records(records)
+        approximate = stage == "explain_approximate"
+        return lambda: model.explain_batch(encoded, approximate=approximate), None
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def measure(stage: str, model: Model, records: list, messages: list, repeat: int) -> dict:
+    """Замер одного этапа на одном размере батча."""
+    batch, one = make_stage(stage, model, records, messages)
+    n = len(records)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if batch is not None:
+            begin = time.perf_counter()
+            batch()
+            latencies.append(time.perf_counter() - begin)
+            continue
+        for i in range(n):
+            begin = time.perf_counter()
+            one(i)
+            latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+
+    # память измеряется отдельным прогоном: tracemalloc замедляет выполнение
+    tracemalloc.start()
+    if batch is not None:
+        batch()
+    else:
+        for i in range(n):
+            one(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        "records": n,
+        "repeat": repeat,
+        "throughput_rps": n * repeat / elapsed,
+        "latency_unit": "batch" if batch is not None else "record",
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        },
+        "memory_peak_mb": peak / 2**20,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Сравнение с предыдущим прогоном;
+
+    Returns:
+        list: строки с описанием регрессий -- падение пропускной способности
+              больше чем на threshold (доля).
+    """
+    regressions = []
+    for stage, sizes in results["results"].items():
+        for size, result in sizes.items():
+            base = baseline.get("results", {}).get(stage, {}).get(size)
+            if base is None:
+                continue
+            change = result["throughput_rps"] / base["throughput_rps"] - 1
+            line = f"{stage:>18} {size:>7}: throughput {change:+.1%}"
+            print(line)
+            if change < -threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", default="xgboost")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--sizes", default="1,32,1000,100000")
+    parser.add_argument(
+        "--max-per-record",
+        type=int,
+        default=1000,
+        help="skip per-record stages for batches larger than this",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="json file for the results")
+    parser.add_argument("--compare", help="json file with the results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--no-metrics", action="store_true", help="disable metrics collection")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    REGISTRY.enabled = not args.no_metrics
+    model = Model.load(args.model, lazy=False, backend=args.backend)
+    features = model.get_features_dict()
+    source = load_records()
+    rng = np.random.default_rng(args.seed)
+
+    results = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "model": args.model,
+            "backend": args.backend,
+            "seed": args.seed,
+            "metrics": REGISTRY.enabled,
+        },
+        "results": {},
+    }
+
+    for stage in args.stages.split(","):
+        results["results"][stage] = {}
+        for size in map(int, args.sizes.split(",")):
+            if stage in PER_RECORD_STAGES and size > args.max_per_record:
+                continue
+            records = [source[i] for i in rng.integers(0, len(source), size)]
+            messages = [to_message(record, features) for record in records]
+            # большие батчи повторяются один раз
+            repeat = args.repeat if size <= 1000 else 1
+
+            result = measure(stage, model, records, messages, repeat)
+            results["results"][stage][str(size)] = result
+            print(
+                f"{stage:>18} {size:>7}: {result['throughput_rps']:12.0f} rec/s, "
+                f"p50 {result['latency_ms']['p50']:9.3f} ms, "
+                f"p99 {result['latency_ms']['p99']:9.3f} ms "
+                f"(per {result['latency_unit']}), "
+                f"peak {result['memory_peak_mb']:8.1f} MB"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions (throughput dropped by more than {args.threshold:.0%}):")
+            print("\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,249 @@
-import os
-import pickle
+import asyncio
 
-from dotenv import load_dotenv
-import telebot
+from telebot import asyncio_helper, util
+from telebot.async_telebot import AsyncTeleBot
 
-from inference.model_inference import process
+from conversation import awaited_species, awaiting_params, create_state_store
+from inference.errors import InternalError, OverloadedError
+from inference.executor import AsyncInference
+from inference.transport import InferenceClient, InlineClient, SocketClient
 from models.model import Model
+from models.species import Species, SpeciesRegistry
+from monitoring.metrics import REGISTRY
+from ratelimit import TokenBucketLimiter
 from inference.docs import (
-    HELP_DOC,
-    model_features,
-    PROCESS_DOC,
-    REQUEST_HELP,
-    HELLO,
-    model_features_lesion,
+    FEATURE_CALLBACK,
+    INTERNAL_ERROR,
+    OVERLOADED,
+    StaticResponses,
+    species_list,
+    species_selected,
+    throttled,
+    responses_for,
+    unknown_species,
 )
+import settings
+from worker import (
+    create_species_registry,
+    declared_species,
+    make_handler,
+    setup_monitoring,
+    start_local_workers,
+)
+
+
+# Инициализация бота; обработчики -- корутины, сообщения разных чатов
+# обрабатываются конкурентно, инференс выполняется в пуле потоков (AsyncInference)
+if settings.TELEGRAM_API_URL:
+    asyncio_helper.API_URL = settings.TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
+bot = AsyncTeleBot(settings.BOT_TOKEN)
+
+# ограничение частоты запросов к инференсу от одного чата;
+# общее число запросов в работе ограничено в AsyncInference (BOT_MAX_PENDING)
+limiter = None
+if settings.RATE_LIMIT_PER_MINUTE > 0:
+    limiter = TokenBucketLimiter(
+        settings.RATE_LIMIT_PER_MINUTE / 60, settings.RATE_LIMIT_BURST, settings.STATE_MAX_SIZE
+    )
+
+# Описания параметров видов животных и клиент сервиса инференса создаются при запуске, см. main();
+# models -- модели видов, если инференс выполняется в процессе бота (INFERENCE_TRANSPORT=inline)
+schemas = None
+models = None
+inference = None
+# состояния диалогов: после команды /process от чата ожидается сообщение с параметрами
+states = create_state_store(
+    settings.STATE_BACKEND, settings.STATE_PATH, settings.STATE_MAX_SIZE, settings.STATE_TTL
+)
+# вид животного, выбранный чатом командой /species
+chat_species = create_state_store(
+    settings.STATE_BACKEND,
+    settings.STATE_PATH,
+    settings.STATE_MAX_SIZE,
+    settings.SPECIES_TTL,
+    "species",
+)
+
+
+def describe(species: Species) -> Model:
+    """Модель без предиктора: описание параметров вида для ответов на команды."""
+    return Model(encoder=species.encoder())
+
+
+def create_inference(models: SpeciesRegistry = None) -> InferenceClient:
+    """Клиент сервиса инференса согласно settings.INFERENCE_TRANSPORT;
+
+    Args:
+        models (SpeciesRegistry): модели видов, используются при инференсе в процессе бота;
 
-# Подгружаем параметры из .env-файла
-load_dotenv()
-BOT_TOKEN = os.environ.get("BOT_TOKEN")
-MODEL_PATH = os.environ.get("MODEL_PATH")
+    Returns:
+        InferenceClient: клиент, возвращающий сообщение-ответ на текст сообщения.
+    """
+    if settings.INFERENCE_TRANSPORT == "local":
+        return start_local_workers(
+            settings.MODEL_PATH, settings.INFERENCE_WORKERS, settings.BOT_NUM_THREADS
+        )
+    if settings.INFERENCE_TRANSPORT == "socket":
+        return SocketClient(settings.INFERENCE_ADDRESS)
+    if settings.INFERENCE_TRANSPORT == "inline":
+        return InlineClient(make_handler(models))
+    raise ValueError(f"Unknown INFERENCE_TRANSPORT: {settings.INFERENCE_TRANSPORT}")
 
-dirname = os.path.dirname(__file__)
-dirname = os.path.split(dirname)[0]
-model_path = os.path.join(dirname, MODEL_PATH)
 
-# Загружаем модель
-xgb = pickle.load(open(model_path, "rb"))
-model = Model(xgb)
+async def species_of(chat_id: int) -> str:
+    """Вид животного, выбранный чатом, либо вид по умолчанию."""
+    name = await chat_species.get_async(chat_id)
+    return name if name in schemas.species else schemas.default
 
 
-# Инициализация бота
-bot = telebot.TeleBot(BOT_TOKEN)
+def responses(name: str) -> StaticResponses:
+    """Ответы на команды для вида животного, см. responses_for;
+
+    Строятся по модели, выдающей рекомендации, если она загружена в процессе бота,
+    и заново после её перезагрузки; иначе -- по описанию параметров вида.
+    """
+    model = models.peek(name) if models is not None else None
+    return responses_for(model if model is not None else schemas.get(name))
 
 
 # Далее идёт описание комманд чата
+# Сообщение без команды -- параметры, если их ждут после /process;
+# состояние проверяется в обработчике, а не в фильтре: фильтры вызываются
+# синхронно, и хранилище SQLite задерживало бы event loop
+@bot.message_handler(func=lambda message: not util.is_command(message.text))
+async def process_following(message):
+    # состояние могло устареть или быть снято другим процессом бота
+    species = awaited_species(await states.pop_async(message.chat.id))
+    if species is None:
+        return await other(message)
+    with REGISTRY.span("handle_message"):
+        reply = await answer(message, species or await species_of(message.chat.id))
+        with REGISTRY.span("send_message"):
+            await bot.send_message(message.chat.id, reply)
+
+
+async def answer(message, species: str) -> str:
+    """Ответ на сообщение с параметрами животного вида species с учетом ограничений нагрузки;
+
+    Отклоненный запрос можно повторить, не вводя /process заново.
+    """
+    wait = limiter.acquire(message.chat.id) if limiter is not None else 0
+    if wait:
+        REGISTRY.inc("throttled_total", labels={"reason": "rate"})
+        await states.set_async(message.chat.id, awaiting_params(species))
+        return throttled(wait)
+
+    try:
+        return await inference(message.text, settings.INFERENCE_TIMEOUT, species)
+    except OverloadedError:
+        REGISTRY.inc("throttled_total", labels={"reason": "concurrency"})
+        await states.set_async(message.chat.id, awaiting_params(species))
+        return OVERLOADED
+    except InternalError:
+        return INTERNAL_ERROR
+
+
+# Ответы на команды ниже построены заранее для вида животного, выбранного чатом,
+# см. responses_for
 @bot.message_handler(commands=["start"])
-def start(message):
-    bot.reply_to(message, HELLO)
+async def start(message):
+    await bot.reply_to(message, responses(await species_of(message.chat.id)).hello)
 
 
 @bot.message_handler(commands=["help"])
-def help(message):
-    bot.reply_to(message, HELP_DOC)
+async def help(message):
+    await bot.reply_to(message, responses(await species_of(message.chat.id)).help)
 
 
 @bot.message_handler(commands=["features"])
-def features(message):
-    bot.reply_to(message, model_features(model))
+async def features(message):
+    await bot.reply_to(message, responses(await species_of(message.chat.id)).features)
 
 
 @bot.message_handler(commands=["features_lesion"])
-def feaures_lesion(message):
-    bot.reply_to(message, model_features_lesion(model))
+async def feaures_lesion(message):
+    await bot.reply_to(message, responses(await species_of(message.chat.id)).features_lesion)
 
 
-@bot.message_handler(commands=["process"])
-def process_handler(message):
-    send = bot.send_message(
-        message.chat.id,
-        PROCESS_DOC,
+@bot.message_handler(commands=["features_keyboard"])
+async def features_keyboard(message):
+    species_responses = responses(await species_of(message.chat.id))
+    await bot.reply_to(
+        message, species_responses.features, reply_markup=species_responses.features_keyboard
     )
-    bot.register_next_step_handler(send, process_following)
 
 
-def process_following(message):
-    bot.send_message(message.chat.id, process(model, message.text))
+# Нажатие кнопки клавиатуры параметров
+@bot.callback_query_handler(func=lambda call: (call.data or "").startswith(FEATURE_CALLBACK))
+async def feature_values(call):
+    key = call.data[len(FEATURE_CALLBACK):]
+    values = responses(await species_of(call.message.chat.id)).feature_values.get(key)
+    await bot.answer_callback_query(call.id)
+    if values is not None:
+        await bot.send_message(call.message.chat.id, values)
+
+
+# /species -- список видов животных, /species <вид> -- выбор вида для чата
+@bot.message_handler(commands=["species"])
+async def species_handler(message):
+    name = util.extract_arguments(message.text).strip()
+    if not name:
+        return await bot.reply_to(
+            message, species_list(schemas.species, await species_of(message.chat.id))
+        )
+    if name not in schemas.species:
+        return await bot.reply_to(message, unknown_species(name))
+    await chat_species.set_async(message.chat.id, name)
+    await bot.reply_to(message, species_selected(schemas.species[name].title))
+
+
+# /process <вид> -- параметры животного другого вида, чем выбран чатом
+@bot.message_handler(commands=["process"])
+async def process_handler(message):
+    name = util.extract_arguments(message.text).strip() or await species_of(message.chat.id)
+    if name not in schemas.species:
+        return await bot.reply_to(message, unknown_species(name))
+    await bot.send_message(
+        message.chat.id,
+        responses(name).process,
+    )
+    await states.set_async(message.chat.id, awaiting_params(name))
 
 
 # Если в сообщение не содержится комманда
 @bot.message_handler()
-def other(message):
-    bot.reply_to(message, REQUEST_HELP)
+async def other(message):
+    await bot.reply_to(message, responses(await species_of(message.chat.id)).request_help)
+
 
+def main():
+    global schemas, models, inference
 
-# Запуск
-print("Bot started")
-bot.infinity_polling()
+    setup_monitoring()
+    # Боту нужно только описание параметров каждого вида, оно строится при первом
+    # обращении к виду; модели загружаются в сервисе инференса (create_inference)
+    schemas = SpeciesRegistry(declared_species(), describe, default=settings.DEFAULT_SPECIES)
+    if settings.INFERENCE_TRANSPORT == "inline":
+        models = create_species_registry()
+    inference = AsyncInference(
+        create_inference(models), settings.BOT_NUM_THREADS, settings.BOT_MAX_PENDING
+    )
+    # ответы на команды для вида по умолчанию строятся до первого сообщения
+    responses(schemas.default)
+    REGISTRY.register_collector(inference.gauges)
+    REGISTRY.register_collector(states.gauges)
+    if limiter is not None:
+        REGISTRY.register_collector(limiter.gauges)
+
+    # Запуск
+    print("Bot started")
+    try:
+        asyncio.run(bot.infinity_polling())
+    finally:
+        inference.close()
+        states.close()
+        chat_species.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Хранилище состояний диалогов бота.
+
+Состояние -- строка, например awaiting_params:horse после команды /process
+(см. awaiting_params). Вид животного, выбранный чатом командой /species,
+хранится в отдельном хранилище с тем же интерфейсом.
+Состояние живёт не дольше ttl секунд, число хранимых состояний ограничено
+maxsize (вытесняются самые старые), поэтому брошенные диалоги не копят память.
+
+Бэкенды:
+    MemoryStateStore -- LRU в памяти процесса (по умолчанию);
+    SQLiteStateStore -- файл SQLite, общий для нескольких процессов бота
+                        и сохраняющийся при перезапуске.
+"""
+import asyncio
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+
+
+# бот ждёт сообщение с параметрами для инференса
+AWAITING_PARAMS = "awaiting_params"
+
+
+def awaiting_params(species: str) -> str:
+    """Состояние ожидания параметров животного вида species."""
+    return f"{AWAITING_PARAMS}:{species}"
+
+
+def awaited_species(state: str) -> str:
+    """Вид животного, параметры которого ожидаются;
+
+    Returns:
+        str: вид, "" -- вид по умолчанию (состояние без вида),
+             None -- если параметры не ожидаются.
+    """
+    if state is None:
+        return None
+    if state == AWAITING_PARAMS:
+        return ""
+    prefix, _, species = state.partition(":")
+    return species if prefix == AWAITING_PARAMS else None
+
+
+class StateStore:
+    """Базовое хранилище состояний диалогов.
+
+    Методы *_async -- для обработчиков бота: у хранилищ с вводом-выводом (blocking)
+    обращение выполняется в потоке, чтобы не задерживать event loop.
+    """
+
+    # обращение к хранилищу ждёт ввода-вывода
+    blocking = False
+
+    def get(self, chat_id: int) -> str:
+        """Состояние диалога, None -- если его нет или оно устарело."""
+        raise NotImplementedError
+
+    def set(self, chat_id: int, state: str) -> None:
+        raise NotImplementedError
+
+    def pop(self, chat_id: int) -> str:
+        """Удаление состояния диалога;
+
+        Returns:
+            str: удаленное состояние, None -- если его не было или оно устарело.
+        """
+        raise NotImplementedError
+
+    async def get_async(self, chat_id: int) -> str:
+        return await self.__call(self.get, chat_id)
+
+    async def set_async(self, chat_id: int, state: str) -> None:
+        await self.__call(self.set, chat_id, state)
+
+    async def pop_async(self, chat_id: int) -> str:
+        return await self.__call(self.pop, chat_id)
+
+    async def __call(self, method, *args):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+    def gauges(self) -> dict:
+        """Показатели для monitoring.metrics.Registry.register_collector."""
+        return {f"conversation_states_{name}": value for name, value in self.stats().items()}
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """LRU с ограничением времени жизни в памяти процесса."""
+
+    def __init__(self, maxsize: int = 100000, ttl: float = 900):
+        """
+        Args:
+            maxsize (int): максимальное число состояний;
+            ttl (float): время жизни состояния, секунды.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # chat_id -> (время устаревания, состояние), первыми идут самые старые
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, chat_id: int) -> str:
+        with self._lock:
+            entry = self._states.get(chat_id)
+            if entry is None:
+                return None
+            expires, state = entry
+            if expires < time.monotonic():
+                del self._states[chat_id]
+                self.expirations += 1
+                return None
+            return state
+
+    def set(self, chat_id: int, state: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._states[chat_id] = (now + self.ttl, state)
+            self._states.move_to_end(chat_id)
+            # время жизни одинаковое, поэтому первыми устаревают первые записи
+            while self._states:
+                expires, _ = next(iter(self._states.values()))
+                if expires >= now:
+                    break
+                self._states.popitem(last=False)
+                self.expirations += 1
+            while len(self._states) > self.maxsize:
+                self._states.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, chat_id: int) -> str:
+        with self._lock:
+            expires, state = self._states.pop(chat_id, (None, None))
+            if expires is not None and expires < time.monotonic():
+                self.expirations += 1
+                return None
+            return state
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._states),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteStateStore(StateStore):
+    """Состояния в файле SQLite, общем для нескольких процессов.
+
+    Устаревшие и лишние состояния удаляются при каждой записи. Счетчики
+    вытеснений и устареваний -- свои у каждого процесса.
+    """
+
+    blocking = True
+
+    def __init__(
+        self, path: str, maxsize: int = 100000, ttl: float = 900, table: str = "states"
+    ):
+        """
+        Args:
+            path (str): путь к файлу базы, создаётся при необходимости;
+            maxsize (int): максимальное число состояний;
+            ttl (float): время жизни состояния, секунды;
+            table (str): таблица, у разных хранилищ в одном файле -- разные.
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Wrong table name: {table}")
+        self.path = path
+        self.table = table
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # блокировки между процессами ждём, а не падаем сразу
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(chat_id INTEGER PRIMARY KEY, state TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires)"
+            )
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, chat_id: int) -> str:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT state, expires FROM {self.table} WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+        # время по часам системы: состояния общие для процессов и перезапусков
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, chat_id: int, state: str) -> None:
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (chat_id, state, expires) VALUES (?, ?, ?)",
+                (chat_id, state, now + self.ttl),
+            )
+            self.expirations += self._db.execute(
+                f"DELETE FROM {self.table} WHERE expires < ?", (now,)
+            ).rowcount
+            self.evictions += self._db.execute(
+                f"DELETE FROM {self.table} WHERE chat_id IN "
+                f"(SELECT chat_id FROM {self.table} ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            ).rowcount
+
+    def pop(self, chat_id: int) -> str:
+        with self._lock, self._db:
+            row = self._db.execute(
+                f"DELETE FROM {self.table} WHERE chat_id = ? RETURNING state, expires", (chat_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_state_store(
+    backend: str, path: str, maxsize: int, ttl: float, table: str = "states"
+) -> StateStore:
+    """Хранилище состояний;
+
+    Args:
+        backend (str): memory или sqlite;
+        path (str): файл базы для sqlite;
+        maxsize (int): максимальное число состояний;
+        ttl (float): время жизни состояния, секунды;
+        table (str): таблица в файле базы sqlite;
+
+    Returns:
+        StateStore: хранилище.
+    """
+    if backend == "memory":
+        return MemoryStateStore(maxsize, ttl)
+    if backend == "sqlite":
+        return SQLiteStateStore(path, maxsize, ttl, table)
+    raise ValueError(f"Unknown state backend: {backend}")
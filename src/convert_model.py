@@ -0,0 +1,29 @@
+"""Конвертация pickle-модели xgboost в нативный формат xgboost.
+
+Нативный формат загружается быстрее, не зависит от версии sklearn-обёртки
+и может загружаться лениво (MODEL_LAZY_LOAD). Пример:
+    python ./src/convert_model.py saved_models/xgb.pickle saved_models/xgb.ubj
+После конвертации указать MODEL_PATH=./saved_models/xgb.ubj в .env файле.
+"""
+import argparse
+import time
+
+from models.loader import convert_pickle, load_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled XGBoost model")
+    parser.add_argument("pickle_path")
+    parser.add_argument("output_path", help=".ubj or .json")
+    args = parser.parse_args()
+
+    convert_pickle(args.pickle_path, args.output_path)
+
+    for path in (args.pickle_path, args.output_path):
+        start = time.perf_counter()
+        load_model(path, lazy=False)
+        print(f"{path}: loaded in {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
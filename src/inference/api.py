@@ -0,0 +1,290 @@
+"""HTTP/JSON API инференса для интеграции клиник (запуск -- src/server.py).
+
+Эндпоинты:
+    POST /predict -- одна запись: объект параметров {"surgery": "yes", "pulse": 132, ...}
+                     либо {"text": "surgery: yes, pulse: 132"} в формате сообщения бота;
+    POST /predict_batch -- массив таких записей, либо {"records": [...]};
+    GET /health -- версия модели вида по умолчанию, null -- если она не загружена.
+
+Параметры запроса: species -- вид животного (models.species, по умолчанию -- DEFAULT_SPECIES),
+explain -- число параметров с наибольшим вкладом в каждое предсказание, approximate=1 --
+приближенный расчет вклада.
+
+Одиночные запросы из разных соединений объединяются в батчи (inference.batching),
+массив /predict_batch отправляется в модель одним вызовом в пуле потоков.
+Ответ на запись -- {"outcome": "lived", "probability": 0.93, "model": "xgb.pickle@...",
+"contributors": [...]}, где model -- файл и версия модели, выдавшей предсказание;
+на неверную запись -- {"errors": [...]} (у /predict -- со статусом 400).
+"""
+import asyncio
+from concurrent.futures import Executor
+import contextlib
+import functools
+import json
+import time
+
+from aiohttp import web
+import numpy as np
+
+from inference.audit import AuditLog
+from inference.errors import ParseError
+from inference.parser import parser_for
+from models.registry import served_by
+from models.species import SpeciesRegistry
+from monitoring.metrics import REGISTRY
+
+
+# ответы -- json с кириллицей как есть
+json_response = functools.partial(
+    web.json_response, dumps=functools.partial(json.dumps, ensure_ascii=False)
+)
+
+
+class InferenceAPI:
+    """Обработчики HTTP-запросов поверх моделей видов животных (BatchScheduler каждого вида)."""
+
+    def __init__(
+        self,
+        species: SpeciesRegistry,
+        executor: Executor,
+        max_pending: int = 20000,
+        max_batch_size: int = 10000,
+        audit: AuditLog = None,
+    ):
+        """
+        Args:
+            species (SpeciesRegistry): BatchScheduler каждого вида,
+                                       см. worker.create_species_registry;
+            executor (Executor): пул потоков для /predict_batch и загрузки моделей;
+            max_pending (int): максимальное число записей в работе, сверх него -- ответ 503;
+            max_batch_size (int): максимальное число записей в /predict_batch, сверх него
+                                  (и сверх max_pending) -- 413;
+            audit (AuditLog): журнал, в который записывается каждая рекомендация.
+        """
+        self.species = species
+        self.executor = executor
+        self.max_pending = max_pending
+        self.max_batch_size = max_batch_size
+        self.audit = audit
+        # записей в работе; меняется только в потоке event loop
+        self.pending = 0
+        self.rejected = 0
+
+    def app(self, client_max_size: int = 16 * 2**20) -> web.Application:
+        """Приложение aiohttp;
+
+        Args:
+            client_max_size (int): максимальный размер тела запроса, байты.
+        """
+        app = web.Application(client_max_size=client_max_size)
+        app.router.add_post("/predict", self.predict)
+        app.router.add_post("/predict_batch", self.predict_batch)
+        app.router.add_get("/health", self.health)
+        return app
+
+    async def predict(self, request: web.Request) -> web.Response:
+        with REGISTRY.span("http_request", {"endpoint": "predict"}):
+            try:
+                name, explain, approximate = self.__options(request)
+                record = await self.__json(request)
+            except _RequestError as e:
+                return e.response()
+
+            if not self.__reserve(1):
+                return _overloaded()
+            try:
+                return await self.__predict_one(name, record, explain, approximate)
+            finally:
+                self.pending -= 1
+
+    async def __predict_one(self, name: str, record, explain: int, approximate: bool):
+        async with self.__use(name) as scheduler:
+            start = time.perf_counter()
+            try:
+                features, row = self.__parse(scheduler, record)
+            except ParseError as e:
+                REGISTRY.inc("parse_errors_total")
+                return json_response({"errors": e.errors}, status=400)
+
+            options = (explain, approximate) if explain else None
+            result = await asyncio.wrap_future(scheduler.submit(row, options))
+            prediction = _prediction(
+                result[0][0],
+                result[1],
+                served_by(result, scheduler)[0],
+                result[2] if explain else None,
+            )
+            self.__write_audit(name, features, prediction, start)
+            return json_response(dict(prediction, species=name))
+
+    @contextlib.asynccontextmanager
+    async def __use(self, name: str):
+        """species.use(name) для корутин: вход и выход -- в пуле потоков, не в event loop;
+
+        При входе модель вида может загружаться, при выходе -- выгружаться (вытесненная).
+        """
+        loop = asyncio.get_running_loop()
+        using = self.species.use(name)
+        scheduler = await loop.run_in_executor(self.executor, using.__enter__)
+        try:
+            yield scheduler
+        finally:
+            await loop.run_in_executor(self.executor, using.__exit__, None, None, None)
+
+    async def predict_batch(self, request: web.Request) -> web.Response:
+        with REGISTRY.span("http_request", {"endpoint": "predict_batch"}):
+            try:
+                name, explain, approximate = self.__options(request)
+                records = await self.__json(request)
+                if isinstance(records, dict):
+                    records = records.get("records")
+                if not isinstance(records, list):
+                    raise _RequestError("ожидается массив записей либо {\"records\": [...]}")
+                # массив больше max_pending не поместится, даже если других записей в работе нет
+                limit = min(self.max_batch_size, self.max_pending)
+                if len(records) > limit:
+                    raise _RequestError(f"не больше {limit} записей в запросе", 413)
+            except _RequestError as e:
+                return e.response()
+
+            if not self.__reserve(len(records)):
+                return _overloaded()
+            try:
+                # разбор и кодирование записей -- тоже в пуле потоков: они занимают
+                # event loop тем дольше, чем больше массив
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.__predict_many, name, records, explain, approximate
+                )
+            finally:
+                self.pending -= len(records)
+            return json_response(response)
+
+    def __predict_many(self, name: str, records: list, explain: int, approximate: bool) -> dict:
+        """Предсказания записей массива одним вызовом модели, в потоке пула."""
+        with self.species.use(name) as scheduler:
+            start = time.perf_counter()
+            predictions = [None] * len(records)
+            parsed = []
+            for i, record in enumerate(records):
+                try:
+                    parsed.append((i, *self.__parse(scheduler, record)))
+                except ParseError as e:
+                    REGISTRY.inc("parse_errors_total")
+                    predictions[i] = {"errors": e.errors}
+
+            if parsed:
+                # мимо BatchScheduler: записи уже собраны в батч
+                model = scheduler.model
+                X = np.vstack([row for *_, row in parsed])
+                if explain:
+                    result = model.explain(X, top=explain, approximate=approximate)
+                else:
+                    result = model.predict(X)
+                y, p, *contributors = result
+                models = served_by(result, model)
+                for j, (i, features, _) in enumerate(parsed):
+                    predictions[i] = _prediction(
+                        y[j], p[j], models[j], contributors[0][j] if explain else None
+                    )
+                    self.__write_audit(name, features, predictions[i], start)
+
+            return {"species": name, "predictions": predictions}
+
+    async def health(self, request: web.Request) -> web.Response:
+        # без загрузки модели: вытесненная модель вида по умолчанию -- model null
+        scheduler = self.species.peek()
+        return json_response(
+            {
+                "status": "ok",
+                "species": self.species.default,
+                "model": getattr(scheduler, "version", None),
+                "pending": self.pending,
+            }
+        )
+
+    def __options(self, request: web.Request) -> tuple:
+        """Вид животного и параметры расчета вклада из параметров запроса."""
+        try:
+            name = self.species.resolve(request.query.get("species"))
+        except KeyError:
+            raise _RequestError(f"неизвестный вид животного: {request.query['species']}", 404)
+        try:
+            explain = int(request.query.get("explain", 0))
+        except ValueError:
+            raise _RequestError("explain -- число параметров")
+        approximate = request.query.get("approximate", "0") in ("1", "true")
+        return name, max(explain, 0), approximate
+
+    @staticmethod
+    async def __json(request: web.Request):
+        try:
+            return await request.json()
+        except ValueError:
+            raise _RequestError("тело запроса -- не json")
+
+    @staticmethod
+    def __parse(scheduler, record) -> tuple:
+        """Параметры и закодированная запись: из текста в формате сообщения бота или объекта."""
+        parser = parser_for(scheduler)
+        if isinstance(record, dict) and isinstance(record.get("text"), str):
+            return parser.parse_encode(record["text"])
+        return parser.parse_record(record)
+
+    def __reserve(self, records: int) -> bool:
+        """Учет записей в работе; False -- сервис перегружен."""
+        if self.pending + records > self.max_pending:
+            self.rejected += 1
+            REGISTRY.inc("throttled_total", labels={"reason": "http"})
+            return False
+        self.pending += records
+        return True
+
+    def __write_audit(self, name: str, features: dict, prediction: dict, start: float) -> None:
+        if self.audit is None:
+            return
+        self.audit.write(
+            {
+                "time": time.time(),
+                "species": name,
+                "model": prediction["model"],
+                "features": features,
+                "outcome": prediction["outcome"],
+                "probability": prediction["probability"],
+                "contributors": prediction.get("contributors"),
+                "latency_ms": (time.perf_counter() - start) * 1e3,
+            }
+        )
+
+    def gauges(self) -> dict:
+        return {
+            "http_pending": self.pending,
+            "http_max_pending": self.max_pending,
+            "http_rejected": self.rejected,
+        }
+
+
+def _prediction(outcome, probability, model: str, contributors: list = None) -> dict:
+    """Ответ на запись; model -- модель, выдавшая предсказание (при A/B-сравнении -- одна из двух)."""
+    prediction = {"outcome": outcome, "probability": float(probability), "model": model}
+    if contributors is not None:
+        prediction["contributors"] = [[feature, value] for feature, value in contributors]
+    return prediction
+
+
+def _overloaded() -> web.Response:
+    return json_response(
+        {"errors": ["сервис перегружен, повторите запрос позже"]},
+        status=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+class _RequestError(Exception):
+    """Неверный запрос целиком, ответ -- {"errors": [...]} со статусом status."""
+
+    def __init__(self, error: str, status: int = 400):
+        super().__init__(error)
+        self.status = status
+
+    def response(self) -> web.Response:
+        return json_response({"errors": [str(self)]}, status=self.status)
@@ -0,0 +1,237 @@
+"""Журнал рекомендаций бота для клинического разбора.
+
+Каждая рекомендация (параметры на входе, версия модели, исход и вероятность,
+время инференса) записывается фоновым потоком: записи копятся в ограниченной
+очереди и сбрасываются пачками в файлы jsonl.gz. Пачка -- отдельный gzip-член,
+дописываемый в конец файла, поэтому файл только дополняется, а при аварийном
+завершении теряется не больше одной пачки. Файл сменяется по размеру и по времени;
+у каждого процесса свои файлы (pid в имени).
+
+Если диск не успевает и очередь заполнена, запись ждёт не дольше block_timeout
+(обратное давление на инференс), затем отбрасывается и учитывается в audit_dropped.
+
+Повтор записанных входов через модель для проверки на регрессии
+(сравниваются записи, рекомендации которых выдала модель из того же файла):
+    python ./src/replay.py audit/ --model saved_models/xgb.pickle
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Iterator
+
+import numpy as np
+
+from models.model import Model
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    """Фоновая пакетная запись рекомендаций в файлы jsonl.gz."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 2**20,
+        max_age: float = 3600,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        batch_size: int = 1000,
+        block_timeout: float = 0.05,
+    ):
+        """
+        Args:
+            directory (str): директория файлов журнала, создаётся при необходимости;
+            max_bytes (int): размер файла, после которого начинается новый;
+            max_age (float): время, секунды, после которого начинается новый файл;
+            flush_interval (float): максимальное время записи в очереди до сброса на диск, секунды;
+            max_pending (int): максимальное число записей в очереди (ограничение памяти);
+            batch_size (int): максимальное число записей в одной пачке;
+            block_timeout (float): сколько ждать места в заполненной очереди, секунды.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._file = None
+        self._opened_at = None
+        self._stopped = threading.Event()
+
+        # счетчики
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.files = 0
+
+        self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> bool:
+        """Постановка записи в очередь на запись;
+
+        Args:
+            record (dict): запись, сериализуемая в json;
+
+        Returns:
+            bool: False, если очередь так и не освободилась и запись отброшена.
+        """
+        try:
+            self._queue.put(record, timeout=self.block_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        while not (self._stopped.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._flush(batch)
+            except OSError:
+                logger.exception("Can't write %s audit records", len(batch))
+                with self._lock:
+                    self.dropped += len(batch)
+                # следующая пачка пишется в новый файл
+                self._close_file()
+        self._close_file()
+
+    def _collect(self) -> list:
+        """Сбор пачки: ждём первую запись, затем добираем до batch_size в пределах flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # при остановке не ждём, а дописываем то, что уже в очереди
+                if remaining > 0 and not self._stopped.is_set():
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list) -> None:
+        """Запись пачки отдельным gzip-членом в конец текущего файла."""
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+        data = gzip.compress(lines.encode("utf-8"), compresslevel=6)
+
+        if self._file is None or self.__should_rotate():
+            self._close_file()
+            self._open_file()
+        self._file.write(data)
+        self._file.flush()
+
+        self.written += len(batch)
+        self.batches += 1
+
+    def __should_rotate(self) -> bool:
+        return (
+            self._file.tell() >= self.max_bytes
+            or time.monotonic() - self._opened_at >= self.max_age
+        )
+
+    def _open_file(self) -> None:
+        name = f"audit-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.files}.jsonl.gz"
+        self._file = open(os.path.join(self.directory, name), "ab")
+        self._opened_at = time.monotonic()
+        self.files += 1
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                logger.exception("Can't close the audit file")
+            self._file = None
+
+    def gauges(self) -> dict:
+        """Показатели для monitoring.metrics.Registry.register_collector."""
+        return {
+            "audit_pending": self._queue.qsize(),
+            "audit_written": self.written,
+            "audit_dropped": self.dropped,
+            "audit_batches": self.batches,
+            "audit_files": self.files,
+        }
+
+    def close(self, timeout: float = None) -> None:
+        """Запись оставшихся в очереди записей и закрытие файла."""
+        self._stopped.set()
+        self._thread.join(timeout)
+
+
+def read_audit(path: str) -> Iterator[dict]:
+    """Записи журнала;
+
+    Args:
+        path (str): файл журнала или директория (читаются все audit-*.jsonl.gz по порядку имен);
+
+    Returns:
+        Iterator[dict]: записи в порядке записи.
+    """
+    paths = [path]
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, "audit-*.jsonl.gz")))
+    for file_path in paths:
+        try:
+            with gzip.open(file_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+        except EOFError:
+            # последняя пачка файла, который ещё пишется или был прерван
+            continue
+
+
+def model_file(record: dict) -> str:
+    """Файл модели, выдавшей рекомендацию записи, без версии (например, xgb.pickle);
+
+    Returns:
+        str: файл, None -- если модель неизвестна (в записях, сделанных до учета
+             модели каждой рекомендации, при A/B-сравнении записаны обе модели).
+    """
+    model = record.get("model")
+    if not model or " + " in model:
+        return None
+    return model.partition("@")[0]
+
+
+def replay(records: list, model: Model, tolerance: float = 1e-6) -> list:
+    """Повтор записанных входов через Model.predict;
+
+    Args:
+        records (list): записи журнала, см. read_audit; сравнивать имеет смысл записи
+                        одной модели (см. model_file), а не всех моделей A/B-сравнения;
+        model (Model): модель, с которой сравниваются записанные рекомендации;
+        tolerance (float): допустимое отличие вероятности;
+
+    Returns:
+        list: (запись, новый исход, новая вероятность) записей, рекомендация которых изменилась.
+    """
+    if not records:
+        return []
+    y, p = model.predict([record["features"] for record in records])
+    changed = []
+    for record, outcome, probability in zip(records, y, np.atleast_1d(p)):
+        if outcome != record["outcome"] or abs(probability - record["probability"]) > tolerance:
+            changed.append((record, outcome, float(probability)))
+    return changed
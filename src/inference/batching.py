@@ -0,0 +1,214 @@
+from collections import Counter
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+from models.model import Model
+from models.registry import Routed
+from monitoring.metrics import REGISTRY
+
+
+# границы корзин гистограммы размеров батчей
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class BatchScheduler:
+    """Микро-батчинг запросов к модели.
+
+    Запросы из разных потоков складываются в очередь и отправляются в модель
+    одним вызовом, как только набирается max_batch_size записей,
+    либо с момента первого запроса в батче прошло max_wait секунд.
+    Каждый вызывающий получает свой результат.
+
+    Поддерживает encoder, get_features_dict(), predict и explain (dict или закодированная запись),
+    поэтому может использоваться вместо Model в inference.model_inference.process.
+    """
+
+    def __init__(self, model: Model, max_batch_size: int = 32, max_wait: float = 0.005):
+        """
+        Args:
+            model (Model): модель, в которую отправляются батчи;
+            max_batch_size (int): максимальный размер батча;
+            max_wait (float): максимальное время ожидания набора батча, секунды.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive")
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # счетчики
+        self._requests = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._batch_sizes = Counter()
+
+    def start(self) -> "BatchScheduler":
+        """Запуск фонового потока, собирающего батчи."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="batch-scheduler", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        """Остановка фонового потока; запросы из очереди будут обработаны."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def encoder(self):
+        return self.model.encoder
+
+    @property
+    def version(self):
+        return getattr(self.model, "version", None)
+
+    def get_features_dict(self):
+        return self.model.get_features_dict()
+
+    def submit(self, record, explain: tuple = None) -> Future:
+        """Постановка записи в очередь;
+
+        Args:
+            record (dict | np.array): параметры на вход модели,
+                                      либо закодированная запись (Encoder.encode_one_record);
+            explain (tuple): None -- только предсказание,
+                             либо (top, approximate) -- параметры Model.explain;
+
+        Returns:
+            Future: результат в формате Model.predict(record) или Model.explain(record).
+        """
+        if self._thread is None:
+            raise RuntimeError("Scheduler is not started")
+
+        future = Future()
+        self._queue.put((record, future, explain))
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def predict(self, X, timeout: float = None):
+        """Блокирующий аналог Model.predict для одной записи (dict или 1-d np.array)."""
+        if not isinstance(X, (dict, np.ndarray)):
+            raise ValueError("X must be dict or np.ndarray")
+        return self.submit(X).result(timeout)
+
+    def explain(self, X, top: int = 3, approximate: bool = False, timeout: float = None):
+        """Блокирующий аналог Model.explain для одной записи (dict или 1-d np.array)."""
+        if not isinstance(X, (dict, np.ndarray)):
+            raise ValueError("X must be dict or np.ndarray")
+        return self.submit(X, (top, approximate)).result(timeout)
+
+    def stats(self) -> dict:
+        """Счетчики: число запросов и батчей, глубина очереди, гистограмма размеров батчей."""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            }
+
+    def gauges(self) -> dict:
+        """Показатели для monitoring.metrics.Registry.register_collector."""
+        stats = self.stats()
+        return {
+            "batch_queue_depth": stats["queue_depth"],
+            "batch_queue_max_depth": stats["max_queue_depth"],
+        }
+
+    def _collect(self) -> list:
+        """Сбор очередного батча: ждём первый запрос, затем добираем до лимитов."""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stopped.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: list) -> None:
+        """Один вызов модели на все записи батча с одинаковыми параметрами и раздача результатов."""
+        with self._lock:
+            self._batches += 1
+            self._batch_sizes[len(batch)] += 1
+        if REGISTRY.enabled:
+            REGISTRY.histogram(
+                "batch_size", help="Sizes of the batches", buckets=BATCH_SIZE_BUCKETS
+            ).observe(len(batch))
+
+        groups = {}
+        for record, future, explain in batch:
+            groups.setdefault(explain, []).append((record, future))
+
+        for explain, items in groups.items():
+            records = [record for record, _ in items]
+            futures = [future for _, future in items]
+            try:
+                if explain is None:
+                    result = self.model.predict(self._stack(records))
+                else:
+                    top, approximate = explain
+                    result = self.model.explain(
+                        self._stack(records), top=top, approximate=approximate
+                    )
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            # тот же формат ответа, что и у Model.predict (Model.explain) для одной записи;
+            # у ModelRegistry -- с моделью, выдавшей предсказание записи (Routed)
+            y, p, *contributors = result
+            models = getattr(result, "models", None)
+            for i, future in enumerate(futures):
+                record_result = ([y[i]], p[i], *[c[i] for c in contributors])
+                if models is not None:
+                    record_result = Routed(record_result, [models[i]])
+                future.set_result(record_result)
+
+    def _stack(self, records: list):
+        """Вход Model.predict для батча: список словарей, либо матрица закодированных записей."""
+        if all(isinstance(record, dict) for record in records):
+            return records
+        encoder = self.model.encoder
+        return np.vstack(
+            [
+                encoder.encode_one_record(record) if isinstance(record, dict) else record
+                for record in records
+            ]
+        )
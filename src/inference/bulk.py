@@ -0,0 +1,139 @@
+"""Пакетная оценка csv-файлов с записями клиник.
+
+Файл читается частями, части оцениваются в пуле процессов (модель загружается
+в каждом процессе один раз), результаты пишутся по мере готовности в порядке
+входного файла. В работе одновременно находится не больше max_pending частей,
+поэтому расход памяти не зависит от размера файла.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import warnings
+
+import pandas as pd
+
+from models.diagnostics import Diagnostics
+from models.encoder import Encoder
+from models.model import Model
+from models.reader import read_csv_chunks
+from monitoring.metrics import REGISTRY
+
+
+# модель процесса-обработчика, см. _init_worker
+_model = None
+
+
+def _init_worker(model_path: str) -> None:
+    global _model
+    # предупреждения (например, о формате файла модели) повторялись бы в каждом процессе,
+    # проблемы записей собираются в Diagnostics
+    warnings.simplefilter("ignore")
+    REGISTRY.enabled = False
+    _model = Model.load(model_path)
+    # параллелизм обеспечивается процессами, потоки xgboost только мешают друг другу
+    if hasattr(_model.model, "get_booster"):
+        _model.model.get_booster().set_param({"nthread": 1})
+
+
+def score_frame(
+    model: Model, chunk: pd.DataFrame, explain: int = 0, approximate: bool = False
+) -> tuple:
+    """Оценка части файла;
+
+    Args:
+        model (Model): модель;
+        chunk (pd.DataFrame): записи, колонки -- параметры модели (лишние игнорируются),
+                              пропуски -- NaN; см. models.reader.read_csv_chunks;
+        explain (int): число параметров с наибольшим вкладом в предсказание, см. Model.explain_batch;
+        approximate (bool): приближенный расчет вклада параметров;
+
+    Returns:
+        tuple: DataFrame с колонками id (если была во входе), outcome, вероятности классов
+               и при explain -- пары колонок explain_{i}_feature, explain_{i}_contribution,
+               и Diagnostics -- число пропущенных и неверных значений каждого параметра.
+    """
+    # кодирование по колонкам, без перевода строк в словари
+    encoded, diagnostics = model.encoder.encode_frame(chunk)
+    if explain:
+        y, proba, features, contributions = model.explain_batch(
+            encoded, top=explain, approximate=approximate
+        )
+    else:
+        y, proba = model.predict_batch(encoded)
+
+    result = pd.DataFrame(index=chunk.index)
+    if "id" in chunk:
+        result["id"] = chunk["id"]
+    result["outcome"] = y
+    for i, name in sorted(model.encoder.outcome_mapping.items()):
+        result[f"proba_{name}"] = proba[:, i]
+    for i in range(features.shape[1] if explain else 0):
+        result[f"explain_{i + 1}_feature"] = features[:, i]
+        result[f"explain_{i + 1}_contribution"] = contributions[:, i]
+    return result, diagnostics
+
+
+def _score_chunk(chunk: pd.DataFrame, explain: int, approximate: bool) -> tuple:
+    return score_frame(_model, chunk, explain, approximate)
+
+
+def score_csv(
+    input_path: str,
+    output_path: str,
+    model_path: str,
+    chunksize: int = 10000,
+    workers: int = None,
+    max_pending: int = None,
+    explain: int = 0,
+    approximate: bool = False,
+) -> tuple:
+    """Оценка csv-файла в пуле процессов;
+
+    Args:
+        input_path (str): входной csv-файл, например data/test.csv;
+        output_path (str): выходной csv-файл;
+        model_path (str): путь к модели;
+        chunksize (int): число строк в одной части;
+        workers (int): число процессов, по умолчанию -- число ядер;
+        max_pending (int): максимальное число частей в работе, по умолчанию 2 * workers;
+        explain (int): число параметров с наибольшим вкладом в каждое предсказание, см. score_frame;
+        approximate (bool): приближенный расчет вклада параметров;
+
+    Returns:
+        int: число оцененных записей;
+        Diagnostics: число пропущенных и неверных значений каждого параметра во всём файле.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+
+    encoder = Encoder()
+    diagnostics = Diagnostics(encoder.encode_order)
+    pending = deque()
+    scored = 0
+    header = True
+
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_path,),
+    ) as executor, open(output_path, "w", newline="") as output:
+
+        def write_first() -> None:
+            nonlocal scored, header
+            result, chunk_diagnostics = pending.popleft().result()
+            diagnostics.update(chunk_diagnostics)
+            result.to_csv(output, index=False, header=header)
+            header = False
+            scored += len(result)
+
+        for chunk in read_csv_chunks(input_path, chunksize, encoder):
+            if len(pending) >= max_pending:
+                write_first()
+            pending.append(executor.submit(_score_chunk, chunk, explain, approximate))
+
+        while pending:
+            write_first()
+
+    return scored, diagnostics
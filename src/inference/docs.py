@@ -1,13 +1,19 @@
 import inspect
+import math
+from weakref import WeakKeyDictionary
+
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 from models.model import Model
 
 
 HELP_DOC = inspect.cleandoc(
     """
-    /process -- ввод данных для расчета;
+    /process -- ввод данных для расчета (/process <вид> -- для другого вида животного);
+    /species -- выбор вида животного (/species <вид>);
     /features -- вывод словаря с описанием возможных значений;
     /features_lesion -- описание возможных значений для параметра lesion_1;
+    /features_keyboard -- возможные значения параметров по кнопкам;
 
     Подробное описание параметров ввода:
     https://github.com/angr1it/zoohelper/blob/main/notebooks/features.md
@@ -32,6 +38,80 @@ REQUEST_HELP = inspect.cleandoc(
     """
 )
 
+PARSE_ERROR = "Возникла ошибка парсинга, либо введены неверные параметры."
+
+
+def parse_error(errors: list) -> str:
+    """Сообщение об ошибке парсинга с описанием неверных параметров;
+
+    Args:
+        errors (list): ParseError.errors;
+
+    Returns:
+        str: сообщение.
+    """
+    if not errors:
+        return PARSE_ERROR
+    return "\n".join([PARSE_ERROR] + [f"- {error}" for error in errors])
+
+
+def explanation(contributors: list) -> str:
+    """Параметры с наибольшим вкладом в рекомендацию;
+
+    Args:
+        contributors (list): пары (параметр, вклад), см. Model.explain;
+
+    Returns:
+        str: строка-сообщение.
+    """
+    lines = [f"- {feature}: {value:+.2f}" for feature, value in contributors]
+    return "\n".join(["Наибольший вклад в прогноз (+ за, - против):"] + lines)
+
+
+def species_list(species: dict, current: str) -> str:
+    """Список видов животных, которых бот умеет оценивать;
+
+    Args:
+        species (dict): {вид: models.species.Species};
+        current (str): вид, выбранный чатом;
+
+    Returns:
+        str: строка-сообщение.
+    """
+    lines = [
+        f"- {name} -- {declaration.title}" + (" (выбран)" if name == current else "")
+        for name, declaration in species.items()
+    ]
+    return "\n".join(
+        ["Виды животных:"] + lines + ["", "Выбрать вид: /species <вид>, например /species horse"]
+    )
+
+
+def species_selected(title: str) -> str:
+    return f"Выбран вид: {title}. Параметры для /process и /features -- этого вида."
+
+
+def unknown_species(name: str) -> str:
+    return f"Неизвестный вид животного: {name}. Список видов: /species"
+
+
+INTERNAL_ERROR = "Внутренняя ошибка. Обратитесь к администраторам."
+
+OVERLOADED = "Бот перегружен запросами, отправьте параметры ещё раз чуть позже."
+
+
+def throttled(wait: float) -> str:
+    """Ответ чату, превысившему ограничение частоты запросов;
+
+    Args:
+        wait (float): через сколько секунд можно повторить запрос;
+
+    Returns:
+        str: строка-сообщение.
+    """
+    return f"Слишком много запросов. Отправьте параметры ещё раз через {math.ceil(wait)} с."
+
+
 HELLO = inspect.cleandoc(
     """
     Привет. Это бот решения проблемы предсказания здоровья лошади.
@@ -79,8 +159,9 @@ def model_features(model: Model) -> str:
         # for val in value:
         #     cats_to_add.append(f"  - {val}")
 
-    cats_to_add.append("  lesion_1:")
-    cats_to_add.append("  - lesion types (see /features_lesion)")
+    if "lesion_1" in d:
+        cats_to_add.append("  lesion_1:")
+        cats_to_add.append("  - lesion types (see /features_lesion)")
 
     CATS_STR += "\n".join(cats_to_add)
     return "\n\n".join([NUMS_STR, YES_NO_STR, CATS_STR])
@@ -98,4 +179,92 @@ def model_features_lesion(model: Model) -> str:
         str: строка-сообщение с перечислением возможных значений lesion_1.
     """
     d = model.get_features_dict()
+    if "lesion_1" not in d:
+        return "lesion_1 is not a feature of this species, see /features"
     return f"lesion_1 possible values:\n{', '.join(d['lesion_1'])}"
+
+
+# префикс callback_data кнопок клавиатуры параметров
+FEATURE_CALLBACK = "feature:"
+
+
+def feature_values(model: Model) -> dict:
+    """Описание возможных значений каждого категориального параметра;
+
+    Args:
+        model (Model): текущая модель, поддерживает Model.get_features_dict();
+
+    Returns:
+        dict: {параметр: строка-сообщение}.
+    """
+    values = {}
+    for key, value in model.get_features_dict().items():
+        if value[0] == "numeric":
+            values[key] = f"{key}: число"
+        elif key == "lesion_1":
+            values[key] = model_features_lesion(model)
+        else:
+            values[key] = f"{key}:\n- " + " | ".join(value)
+    return values
+
+
+def features_keyboard(model: Model) -> InlineKeyboardMarkup:
+    """Клавиатура с кнопкой на каждый нечисловой параметр модели;
+
+    Нажатие кнопки присылает callback_data FEATURE_CALLBACK + параметр.
+
+    Args:
+        model (Model): текущая модель, поддерживает Model.get_features_dict();
+
+    Returns:
+        InlineKeyboardMarkup: клавиатура.
+    """
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    keyboard.add(
+        *[
+            InlineKeyboardButton(key, callback_data=FEATURE_CALLBACK + key)
+            for key, value in model.get_features_dict().items()
+            if value[0] != "numeric"
+        ]
+    )
+    return keyboard
+
+
+class StaticResponses:
+    """Ответы бота, не зависящие от сообщения, построенные для одной версии модели."""
+
+    def __init__(self, model: Model):
+        """
+        Args:
+            model (Model): модель, поддерживает Model.get_features_dict().
+        """
+        self.hello = HELLO
+        self.help = HELP_DOC
+        self.process = PROCESS_DOC
+        self.request_help = REQUEST_HELP
+        self.features = model_features(model)
+        self.features_lesion = model_features_lesion(model)
+        self.feature_values = feature_values(model)
+        self.features_keyboard = features_keyboard(model)
+
+
+_responses = WeakKeyDictionary()
+
+
+def responses_for(model) -> StaticResponses:
+    """Ответы для текущей версии модели, строятся один раз на кодировщик;
+
+    Модель, загруженная worker.create_model, после перезагрузки получает новый
+    кодировщик, и ответы строятся заново при первом обращении.
+
+    Args:
+        model: Model или обёртка с атрибутом encoder (ModelRegistry, BatchScheduler);
+
+    Returns:
+        StaticResponses: ответы.
+    """
+    encoder = model.encoder
+    responses = _responses.get(encoder)
+    if responses is None:
+        responses = _responses[encoder] = StaticResponses(model)
+    return responses
@@ -3,8 +3,18 @@ class InternalError(Exception):
 
 
 class ParseError(Exception):
-    pass
+    def __init__(self, errors: list = ()):
+        """
+        Args:
+            errors (list): описание ошибки каждого неверного параметра.
+        """
+        super().__init__(*errors)
+        self.errors = list(errors)
 
 
 class WrongParamsError(Exception):
     pass
+
+
+class OverloadedError(Exception):
+    pass
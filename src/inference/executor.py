@@ -0,0 +1,61 @@
+"""Запуск инференса из asyncio-кода.
+
+Вызов InferenceClient блокирующий (при транспорте inline -- ещё и cpu-bound),
+поэтому он выполняется в ограниченном пуле потоков, а event loop бота
+продолжает обрабатывать другие чаты. Если в пуле и очереди к нему уже
+max_pending запросов, новый запрос сразу отклоняется (OverloadedError),
+вместо того чтобы ждать неограниченно долго.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from inference.errors import OverloadedError
+from inference.transport import InferenceClient
+
+
+class AsyncInference:
+    """Асинхронная обёртка InferenceClient с ограничением числа запросов."""
+
+    def __init__(self, client: InferenceClient, max_workers: int, max_pending: int):
+        """
+        Args:
+            client (InferenceClient): клиент сервиса инференса;
+            max_workers (int): число потоков, одновременно ожидающих ответа клиента;
+            max_pending (int): максимальное число запросов в работе и в очереди к потокам.
+        """
+        self.client = client
+        self.max_pending = max(max_pending, max_workers)
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="inference")
+
+    async def __call__(self, text: str, timeout: float = None, species: str = None) -> str:
+        """Ответ на сообщение о животном вида species (None -- вид по умолчанию);
+
+        Raises:
+            OverloadedError: если запросов в работе больше max_pending;
+            InternalError: если сервис инференса недоступен или не ответил вовремя.
+        """
+        # счетчик меняется только в потоке event loop, блокировка не нужна
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise OverloadedError
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self.client, text, timeout, species
+            )
+        finally:
+            self.pending -= 1
+
+    def gauges(self) -> dict:
+        return {
+            "inference_pending": self.pending,
+            "inference_max_pending": self.max_pending,
+            "inference_rejected": self.rejected,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
@@ -1,14 +1,22 @@
-import re
+import time
 
 from models.model import Model
+from models.registry import served_by
+from inference.audit import AuditLog
+from inference.docs import INTERNAL_ERROR, PARSE_ERROR, explanation, parse_error
 from inference.errors import ParseError, InternalError, WrongParamsError
+from inference.parser import MessageParser, parser_for
+from monitoring.metrics import REGISTRY
 
 
-def parse_input(features: dict, message: str) -> dict:
+def parse_input(features, message: str) -> dict:
     """Парсинг входящего сообщения.
 
     Args:
-        features (dict): словарь, описывающий параметры модели; Model.get_features_dict()
+        features (Model | dict): модель или обёртка с атрибутом encoder (BatchScheduler) --
+                                 её парсер строится один раз, см. parser_for;
+                                 либо словарь, описывающий параметры модели,
+                                 Model.get_features_dict() -- парсер строится при каждом вызове;
         message (str): сообщение;
 
     Raises:
@@ -17,28 +25,9 @@ def parse_input(features: dict, message: str) -> dict:
     Returns:
         dict: содержащий параметры на вход модели.
     """
-    try:
-        message = re.sub("^\s+|\n|\r|\s+$", "", message)  # noqa: W605
-        message = message.replace(" ", "")
-
-        params = {}
-        for pair in message.split(","):
-            if not pair or pair == '':
-                continue
-
-            key, value = pair.split(":", 1)
-            if key in params:
-                raise Exception
-            if key not in features:
-                continue
-            if features[key] == "numeric":
-                params[key] = float(value)
-            else:
-                params[key] = str(value).strip()
-
-        return params
-    except Exception:
-        raise ParseError
+    if isinstance(features, dict):
+        return MessageParser(features).parse(message)
+    return parser_for(features).parse(message)
 
 
 def prepare_output(result) -> str:
@@ -56,21 +45,65 @@ def prepare_output(result) -> str:
     return f'Рекомендация: лечение не эффективно с вероятностью {result[1] * 100: .2f}%.'
 
 
-def process(model: Model, message: str) -> str:
+def process(
+    model: Model,
+    message: str,
+    explain: int = 0,
+    approximate: bool = False,
+    audit: AuditLog = None,
+    species: str = None,
+) -> str:
     """Запуск инференса модели;
 
     Args:
-        model (Model): модель;
+        model (Model): модель, либо BatchScheduler;
         message (str): необработанное входное сообщение;
+        explain (int): число параметров с наибольшим вкладом в предсказание
+                       для ответа, 0 -- только предсказание (см. Model.explain);
+        approximate (bool): приближенный расчет вклада параметров;
+        audit (AuditLog): журнал, в который записывается каждая рекомендация;
+        species (str): вид животного для журнала (models.species), None -- вид по умолчанию;
 
     Returns:
         str: сообщение-ответ.
     """
+    REGISTRY.inc("requests_total")
     try:
-        data = parse_input(model.get_features_dict(), message)
-        result = model.predict(data)
+        start = time.perf_counter()
+        # парсинг сразу в закодированную запись
+        with REGISTRY.span("parse"):
+            if audit is None:
+                row = parser_for(model).encode(message)
+            else:
+                features, row = parser_for(model).parse_encode(message)
+        with REGISTRY.span("predict"):
+            if explain:
+                result = model.explain(row, top=explain, approximate=approximate)
+            else:
+                result = model.predict(row)
+        if audit is not None:
+            audit.write(
+                {
+                    "time": time.time(),
+                    "species": species,
+                    # модель, выдавшая рекомендацию (при A/B-сравнении -- одна из двух)
+                    "model": served_by(result, model)[0],
+                    "features": features,
+                    "outcome": result[0][0],
+                    "probability": float(result[1]),
+                    "contributors": result[2] if explain else None,
+                    "latency_ms": (time.perf_counter() - start) * 1e3,
+                }
+            )
+        if explain:
+            return prepare_output(result) + "\n\n" + explanation(result[2])
         return prepare_output(result)
-    except (ParseError, WrongParamsError):
-        return "Возникла ошибка парсинга, либо введены неверные параметры."
+    except ParseError as e:
+        REGISTRY.inc("parse_errors_total")
+        return parse_error(e.errors)
+    except WrongParamsError:
+        REGISTRY.inc("parse_errors_total")
+        return PARSE_ERROR
     except InternalError:
-        return "Внутренняя ошибка. Обратитесь к администраторам."
+        REGISTRY.inc("internal_errors_total")
+        return INTERNAL_ERROR
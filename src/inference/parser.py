@@ -0,0 +1,252 @@
+"""Парсер сообщения с параметрами в формате key: value.
+
+Пары разделяются запятой или переводом строки, ключ и значение -- двоеточием:
+    surgery: yes, age: adult,
+    rectal_temp: 38.1
+Парсер строится один раз по описанию параметров модели (Model.get_features_dict()),
+проходит сообщение за один раз и возвращает либо словарь параметров (parse),
+либо сразу закодированную запись для модели (encode), без промежуточного словаря.
+Неизвестные ключи (например, лишние колонки выгрузки клиники) пропускаются
+и учитываются в метрике unknown_features_total, ошибки значений известных
+параметров собираются в ParseError.errors.
+"""
+import math
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from inference.errors import ParseError
+from models.encoder import CATEGORICAL, LESION, NUMERIC, Encoder
+from monitoring.metrics import REGISTRY
+
+
+class MessageParser:
+    """Парсер сообщений с параметрами модели."""
+
+    def __init__(self, features: dict, encoder: Encoder = None):
+        """
+        Args:
+            features (dict): описание параметров модели; Model.get_features_dict();
+            encoder (Encoder): кодировщик модели, нужен для encode() и проверки кодов lesion_1;
+                               без него коды lesion_1 проверяются только на формат.
+        """
+        self.encoder = encoder
+        # ключ -> (тип, допустимые значения) для проверки за один поиск по словарю
+        self.kinds = {}
+        for key, possible_values in features.items():
+            if possible_values[0] == "numeric":
+                self.kinds[key] = (NUMERIC, None)
+            elif key == "lesion_1":
+                self.kinds[key] = (LESION, None)
+            else:
+                self.kinds[key] = (CATEGORICAL, frozenset(possible_values))
+
+        if encoder is not None:
+            # ключ -> (первая колонка, последняя + 1, {значение: колонка}) закодированной записи
+            self.columns = {
+                key: (columns.start, columns.stop, index)
+                for key, _, columns, index, _ in encoder.compiled
+            }
+            # запись, в которой все параметры пропущены; хранится списком:
+            # присваивание элементов списка быстрее, чем элементов массива numpy
+            self.default_row = np.concatenate(
+                [default for *_, default in encoder.compiled]
+            ).tolist()
+
+    def tokenize(self, message: str, row: list = None) -> list:
+        """Разбор сообщения на проверенные пары за один проход;
+
+        Args:
+            message (str): сообщение;
+            row (list): если задан, значения параметров сразу записываются
+                        в колонки закодированной записи (см. encode);
+
+        Raises:
+            ParseError: с описанием ошибки каждого неверного параметра;
+
+        Returns:
+            list: пары (ключ, значение), значения числовых параметров -- float.
+        """
+        items = []
+        errors = []
+        # перевод строки -- такой же разделитель пар, как запятая;
+        # replace и split быстрее разбиения регулярным выражением
+        for token in message.replace("\n", ",").split(","):
+            key, colon, value = token.partition(":")
+            key, value = key.strip(), value.strip()
+            if colon and key and key not in self.kinds:
+                # неизвестный параметр пропускается в check, даже без значения
+                items.append((key, value))
+                continue
+            if not colon or not key or not value:
+                if token and not token.isspace():
+                    errors.append(f"«{token.strip()}» -- ожидается формат key: value")
+                continue
+            items.append((key, value))
+        return self.check(items, row, errors)
+
+    def check(self, items, row: list = None, errors: list = None) -> list:
+        """Проверка пар (ключ, строка-значение), см. tokenize;
+
+        Args:
+            items: пары (ключ, значение), пары с неизвестными ключами пропускаются;
+            row (list): если задан, значения сразу записываются в закодированную запись;
+            errors (list): уже найденные ошибки;
+
+        Raises:
+            ParseError: с описанием ошибки каждого неверного параметра;
+
+        Returns:
+            list: пары (ключ, значение), значения числовых параметров -- float.
+        """
+        pairs = []
+        seen = set()
+        unknown = 0
+        errors = errors if errors is not None else []
+        for key, value in items:
+            kind, possible_values = self.kinds.get(key, (None, None))
+            if kind is None:
+                unknown += 1
+                continue
+            if key in seen:
+                errors.append(f"{key}: параметр указан несколько раз")
+                continue
+            seen.add(key)
+
+            if kind is NUMERIC:
+                try:
+                    value = float(value)
+                except ValueError:
+                    value = math.nan
+                if not math.isfinite(value):
+                    errors.append(f"{key}: ожидается число")
+                    continue
+            elif kind is LESION:
+                if not self.__valid_lesion(value):
+                    errors.append(f"{key}: неверный код {value}, см. /features_lesion")
+                    continue
+            elif value not in possible_values:
+                errors.append(
+                    f"{key}: неверное значение {value}, "
+                    f"возможные: {', '.join(sorted(possible_values))}"
+                )
+                continue
+
+            pairs.append((key, value))
+            if row is not None and not errors:
+                self.__write(row, key, kind, value)
+
+        if unknown:
+            REGISTRY.inc("unknown_features_total", unknown)
+        if errors:
+            raise ParseError(errors)
+        return pairs
+
+    def __valid_lesion(self, code: str) -> bool:
+        if not code.isdigit():
+            return False
+        # 0 -- поражения нет, остальные коды должны раскодироваться
+        if self.encoder is None or not code.strip("0"):
+            return True
+        return bool(self.encoder.lesion_columns(code))
+
+    def parse(self, message: str) -> dict:
+        """Параметры из сообщения;
+
+        Raises:
+            ParseError: с описанием ошибки каждого неверного параметра;
+
+        Returns:
+            dict: параметры на вход модели.
+        """
+        return dict(self.tokenize(message))
+
+    def encode(self, message: str) -> np.array:
+        """Закодированная запись из сообщения, то же, что encoder.encode_one_record(parse(message));
+
+        Пропущенные параметры заполняются значениями по умолчанию.
+
+        Raises:
+            ParseError: с описанием ошибки каждого неверного параметра;
+
+        Returns:
+            np.array: float64 запись длины encoder.encoded_len.
+        """
+        return self.parse_encode(message)[1]
+
+    def parse_encode(self, message: str) -> tuple:
+        """Параметры из сообщения и закодированная запись за один проход;
+
+        Raises:
+            ParseError: с описанием ошибки каждого неверного параметра;
+
+        Returns:
+            tuple: словарь параметров (см. parse) и запись (см. encode).
+        """
+        if self.encoder is None:
+            raise ValueError("Parser was built without encoder")
+
+        row = list(self.default_row)
+        pairs = self.tokenize(message, row)
+        REGISTRY.inc("missing_features_total", len(self.columns) - len(pairs))
+        return dict(pairs), np.array(row)
+
+    def parse_record(self, record: dict) -> tuple:
+        """Параметры и закодированная запись из словаря, например из json-запроса;
+
+        Значения проверяются так же, как в сообщении (см. tokenize): значения
+        могут быть числами или строками, null -- параметр пропущен.
+
+        Raises:
+            ParseError: с описанием ошибки каждого неверного параметра;
+
+        Returns:
+            tuple: словарь параметров (см. parse) и запись (см. encode).
+        """
+        if self.encoder is None:
+            raise ValueError("Parser was built without encoder")
+        if not isinstance(record, dict):
+            raise ParseError(["ожидается объект с параметрами"])
+
+        row = list(self.default_row)
+        items = [
+            (str(key), str(value).strip()) for key, value in record.items() if value is not None
+        ]
+        pairs = self.check(items, row)
+        REGISTRY.inc("missing_features_total", len(self.columns) - len(pairs))
+        return dict(pairs), np.array(row)
+
+    def __write(self, row: list, key: str, kind: str, value) -> None:
+        """Запись значения параметра в колонки закодированной записи."""
+        start, stop, index = self.columns[key]
+        if kind is NUMERIC:
+            row[start] = value
+            return
+
+        # значение по умолчанию заменяется кодированием введенного значения
+        row[start:stop] = [0.0] * (stop - start)
+        if kind is LESION:
+            for column in self.encoder.lesion_columns(value):
+                row[column] = 1.0
+        else:
+            row[index[value]] = 1.0
+
+
+# парсеры, построенные для кодировщиков моделей, см. parser_for
+_parsers = WeakKeyDictionary()
+
+
+def parser_for(model) -> MessageParser:
+    """Парсер для модели, строится один раз на кодировщик;
+
+    Args:
+        model: Model или обёртка с атрибутом encoder (BatchScheduler);
+
+    Returns:
+        MessageParser: парсер с кодированием записей.
+    """
+    encoder = model.encoder
+    parser = _parsers.get(encoder)
+    if parser is None:
+        parser = _parsers[encoder] = MessageParser(encoder.get_features_dict(), encoder)
+    return parser
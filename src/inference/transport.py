@@ -0,0 +1,309 @@
+"""Транспорт между ботом и сервисом инференса.
+
+Бот отправляет текст сообщения и вид животного (models.species, None -- вид
+по умолчанию), сервис инференса возвращает текст ответа.
+Клиенты (сторона бота):
+    InlineClient -- инференс в процессе бота, без очереди;
+    QueueClient -- multiprocessing очереди к дочерним процессам (см. serve_queue);
+    SocketClient -- TCP-соединение к сервису инференса (см. SocketServer).
+
+Протокол SocketClient/SocketServer -- json-строки:
+    запрос {"id": 1, "text": "...", "species": "horse"},
+    ответ {"id": 1, "reply": "..."} или {"id": 1, "error": "..."}.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import threading
+from typing import Callable
+
+from inference.errors import InternalError
+
+
+class InferenceClient:
+    """Базовый клиент сервиса инференса."""
+
+    def submit(self, text: str, species: str = None) -> Future:
+        """Отправка сообщения в сервис инференса;
+
+        Args:
+            text (str): необработанное входное сообщение;
+            species (str): вид животного, None -- вид по умолчанию;
+
+        Returns:
+            Future: сообщение-ответ.
+        """
+        raise NotImplementedError
+
+    def __call__(self, text: str, timeout: float = None, species: str = None) -> str:
+        """Блокирующий запрос;
+
+        Raises:
+            InternalError: если сервис инференса недоступен или не ответил вовремя.
+        """
+        try:
+            return self.submit(text, species).result(timeout)
+        except Exception as e:
+            raise InternalError from e
+
+    def close(self) -> None:
+        pass
+
+
+class InlineClient(InferenceClient):
+    """Инференс в вызывающем потоке."""
+
+    def __init__(self, handler: Callable[[str, str], str]):
+        """
+        Args:
+            handler (Callable[[str, str], str]): обработчик сообщения и вида животного,
+                                                 например worker.make_handler.
+        """
+        self.handler = handler
+
+    def submit(self, text: str, species: str = None) -> Future:
+        future = Future()
+        try:
+            future.set_result(self.handler(text, species))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class _PendingClient(InferenceClient):
+    """Клиент, сопоставляющий асинхронные ответы с запросами по id."""
+
+    def __init__(self):
+        self._ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _register(self, channel=None) -> tuple:
+        """Новый запрос; channel -- соединение, через которое он отправлен."""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, channel)
+        return request_id, future
+
+    def _resolve(self, request_id: int, reply: str = None, error: str = None) -> None:
+        with self._lock:
+            future, _ = self._pending.pop(request_id, (None, None))
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(InternalError(error))
+        else:
+            future.set_result(reply)
+
+    def _fail_all(self, error: Exception, channel=None) -> None:
+        """Ошибка для всех ожидающих запросов, либо только отправленных через channel."""
+        with self._lock:
+            failed = [
+                request_id
+                for request_id, (_, request_channel) in self._pending.items()
+                if channel is None or request_channel is channel
+            ]
+            futures = [self._pending.pop(request_id)[0] for request_id in failed]
+        for future in futures:
+            future.set_exception(error)
+
+
+class QueueClient(_PendingClient):
+    """Клиент поверх пары multiprocessing очередей."""
+
+    def __init__(self, requests, results):
+        """
+        Args:
+            requests: очередь запросов (id, text, species);
+            results: очередь ответов (id, reply, error).
+        """
+        super().__init__()
+        self.requests = requests
+        self.results = results
+        self._closed = threading.Event()
+        self._reader = threading.Thread(
+            target=self._read, name="inference-results", daemon=True
+        )
+        self._reader.start()
+
+    def submit(self, text: str, species: str = None) -> Future:
+        request_id, future = self._register()
+        self.requests.put((request_id, text, species))
+        return future
+
+    def _read(self) -> None:
+        while not self._closed.is_set():
+            try:
+                request_id, reply, error = self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            self._resolve(request_id, reply, error)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._fail_all(InternalError("Client is closed"))
+
+
+class SocketClient(_PendingClient):
+    """Клиент сервиса инференса по TCP; одно постоянное соединение."""
+
+    def __init__(self, address: str, connect_timeout: float = 5):
+        """
+        Args:
+            address (str): адрес сервиса инференса, host:port;
+            connect_timeout (float): время ожидания подключения, секунды.
+        """
+        super().__init__()
+        host, port = address.rsplit(":", 1)
+        self.address = (host, int(port))
+        self.connect_timeout = connect_timeout
+        self._socket = None
+        self._write_lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection(self.address, self.connect_timeout)
+        sock.settimeout(None)
+        reader = threading.Thread(
+            target=self._read, args=(sock,), name="inference-socket", daemon=True
+        )
+        reader.start()
+        return sock
+
+    def submit(self, text: str, species: str = None) -> Future:
+        with self._write_lock:
+            # переподключение, если соединение было потеряно
+            try:
+                if self._socket is None:
+                    self._socket = self._connect()
+            except OSError as e:
+                future = Future()
+                future.set_exception(InternalError(str(e)))
+                return future
+
+            request_id, future = self._register(self._socket)
+            line = json.dumps(
+                {"id": request_id, "text": text, "species": species}, ensure_ascii=False
+            )
+            try:
+                self._socket.sendall((line + "\n").encode("utf-8"))
+            except OSError as e:
+                self._resolve(request_id, error=str(e))
+        return future
+
+    def _read(self, sock: socket.socket) -> None:
+        try:
+            with sock.makefile("r", encoding="utf-8") as f:
+                for line in f:
+                    response = json.loads(line)
+                    self._resolve(
+                        response["id"], response.get("reply"), response.get("error")
+                    )
+        except (OSError, ValueError):
+            pass
+
+        with self._write_lock:
+            if self._socket is sock:
+                self._socket = None
+        self._fail_all(
+            InternalError("Connection to the inference service was lost"), sock
+        )
+
+    def close(self) -> None:
+        with self._write_lock:
+            sock, self._socket = self._socket, None
+        if sock is not None:
+            # shutdown прерывает чтение в потоке _read
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def serve_queue(
+    handler: Callable[[str, str], str], requests, results, threads: int = 8
+) -> None:
+    """Обработка запросов из multiprocessing очереди, до получения None;
+
+    Запросы обрабатываются в пуле потоков, чтобы одновременные запросы
+    могли объединяться в батчи (см. inference.batching).
+
+    Args:
+        handler (Callable[[str, str], str]): обработчик сообщения и вида животного;
+        requests: очередь запросов (id, text, species);
+        results: очередь ответов (id, reply, error);
+        threads (int): число потоков-обработчиков.
+    """
+
+    def handle(request_id: int, text: str, species: str = None) -> None:
+        try:
+            results.put((request_id, handler(text, species), None))
+        except Exception as e:
+            results.put((request_id, None, repr(e)))
+
+    with ThreadPoolExecutor(threads) as executor:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            executor.submit(handle, *request)
+
+
+class SocketServer(socketserver.ThreadingTCPServer):
+    """TCP-сервер инференса; запросы обрабатываются в общем пуле потоков."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: str, handler: Callable[[str, str], str], threads: int = 8):
+        """
+        Args:
+            address (str): адрес, host:port;
+            handler (Callable[[str, str], str]): обработчик сообщения и вида животного;
+            threads (int): число потоков-обработчиков.
+        """
+        host, port = address.rsplit(":", 1)
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(threads)
+        super().__init__((host, int(port)), _ConnectionHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        write_lock = threading.Lock()
+
+        def respond(request_id: int, text: str, species: str) -> None:
+            try:
+                response = {"id": request_id, "reply": self.server.handler(text, species)}
+            except Exception as e:
+                response = {"id": request_id, "error": repr(e)}
+            line = json.dumps(response, ensure_ascii=False) + "\n"
+            try:
+                with write_lock:
+                    self.wfile.write(line.encode("utf-8"))
+            except (OSError, ValueError):
+                # клиент отключился
+                pass
+
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                request_id, text = request["id"], request["text"]
+                species = request.get("species")
+            except (ValueError, KeyError, TypeError):
+                continue
+            try:
+                self.server.executor.submit(respond, request_id, text, species)
+            except RuntimeError:
+                # сервер остановлен
+                break
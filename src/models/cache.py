@@ -0,0 +1,100 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    LRU cache with TTL for model predictions
+
+    Keys are hashes of encoded records, so records that differ only
+    in the order of the keys or in spacing share one entry.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600) -> None:
+        """
+        input: maxsize - maximum number of cached predictions
+               ttl - time to live of a cached prediction in seconds, None - forever
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expiration time, prediction), the oldest entries go first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(encoded_record: np.array) -> bytes:
+        """
+        Canonical hash of the encoded record
+
+        input: encoded_record - array with the encoded record
+        returns: 16 bytes digest
+        """
+        # float32 is what the model sees, so records equal in float32
+        # get equal predictions; + 0.0 turns -0.0 into 0.0
+        canonical = np.ascontiguousarray(encoded_record, dtype=np.float32) + np.float32(0)
+        # every NaN is stored with the same bits
+        canonical[np.isnan(canonical)] = np.nan
+        return hashlib.blake2b(canonical.tobytes(), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        """
+        returns: cached prediction or None if there is no such key or it has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires, prediction = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, key: bytes, prediction) -> None:
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, prediction)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Drops every cached prediction, e.g. when the model was changed
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def gauges(self) -> dict:
+        """
+        Stats for monitoring.metrics.Registry.register_collector
+        """
+        return {f"prediction_cache_{name}": value for name, value in self.stats().items()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+# kinds of the issues found while encoding, columns of Diagnostics.counts
+MISSED, INVALID = 0, 1
+ISSUES = ("missed", "invalid")
+
+
+class Diagnostics:
+    """
+    Counts of the issues of every feature found while encoding a batch of records
+
+    A compact replacement of one warning per issue: encoding only adds
+    the number of the records with an issue, no messages are formatted.
+    MISSED - the feature is absent, the default value is used;
+    INVALID - the value has a wrong format and is skipped.
+    """
+
+    def __init__(self, features) -> None:
+        """
+        input: features - names of the features in the order of encoding (Encoder.encode_order)
+        """
+        self.features = tuple(features)
+        # number of the records with every (feature, issue)
+        self.counts = np.zeros((len(self.features), len(ISSUES)), dtype=np.int64)
+
+    def add(self, position: int, issue: int, count: int = 1) -> None:
+        """
+        input: position - number of the feature in self.features
+               issue - MISSED or INVALID
+               count - number of the records with the issue
+        """
+        self.counts[position, issue] += count
+
+    def update(self, other: "Diagnostics") -> "Diagnostics":
+        """
+        Adds the counts of another batch, e.g. to sum up the chunks of a file
+        """
+        self.counts += other.counts
+        return self
+
+    def total(self, issue: int = None) -> int:
+        """
+        returns: number of the issues of the kind, of any kind if issue is None
+        """
+        if issue is None:
+            return int(self.counts.sum())
+        return int(self.counts[:, issue].sum())
+
+    def to_dict(self) -> dict:
+        """
+        returns: {feature: {issue name: count}} of the features that have issues
+        """
+        return {
+            feature: {
+                name: int(count) for name, count in zip(ISSUES, counts) if count
+            }
+            for feature, counts in zip(self.features, self.counts)
+            if counts.any()
+        }
+
+    def __repr__(self) -> str:
+        return f"Diagnostics({self.to_dict()})"
@@ -1,18 +1,95 @@
-import numpy as np
+from functools import lru_cache
+from types import MappingProxyType
 import warnings
 
+import numpy as np
+
+from models.diagnostics import INVALID, MISSED, Diagnostics
+
+# tables to decode lesion_1 numeric code, see Encoder.__split_lesion
+# first digit of the input code
+LESION_SITE = MappingProxyType(
+    {
+        "1": "gastric",
+        "2": "sm_intestine",
+        "3": "lg_colon",
+        "4": "lg_colon_and_cecum",
+        "5": "cecum",
+        "6": "transverse_colon",
+        "7": "retum/descending_colon",
+        "8": "uterus",
+        "9": "bladder",
+        "11": "all_intestinal_sites",
+        "00": "none",
+    }
+)
+# second digit of the input code
+LESION_TYPE = MappingProxyType(
+    {
+        "1": "simple",
+        "2": "strangulation",
+        "3": "inflammation",
+        "4": "other",
+        "0": "none",
+    }
+)
+# third digit of the input code
+LESION_SUBTYPE = MappingProxyType(
+    {
+        "1": "mechanical",
+        "2": "paralytic",
+        "0": "none",
+    }
+)
+# fourth digit of the input code
+LESION_SPECIFIC_CODE = MappingProxyType(
+    {
+        "1": "obturation",
+        "2": "intrinsic",
+        "3": "extrinsic",
+        "4": "adynamic",
+        "5": "volvulus/torsion",
+        "6": "intussuption",
+        "7": "thromboembolic",
+        "8": "hernia",
+        "9": "lipoma/slenic_incarceration",
+        "10": "displacement",
+        "0": "none",
+    }
+)
+
+# kinds of the compiled features
+NUMERIC, CATEGORICAL, LESION = "numeric", "categorical", "lesion"
+
+# output modes of Encoder.encode_records
+DENSE, CSR = "dense", "csr"
+# number of records that are encoded densely at once for the CSR output
+CSR_BLOCK_SIZE = 65536
+
 
 class Encoder:
     """
     class to encode input dict that contained features from self.encode_order
     into format that required for model prediction
+
+    Missing and malformed features are counted in Diagnostics,
+    one warning per issue is emitted only if warn is True.
+
+    The horse schema below is used by default, the schema of another species
+    is passed as a dict with the same encode_order, default_values
+    and outcome_mapping (see models.species).
     """
 
-    def __init__(self) -> None:
+    def __init__(self, warn: bool = False, schema: dict = None) -> None:
+        """
+        input: warn - also emit a warning for every missing or malformed feature
+                      (costs more than the encoding itself on large batches)
+               schema - dict with encode_order, default_values and outcome_mapping
+                        of another species, None - the horse schema
+        """
+        self.warn = warn
         # mapping for target feature that will be predicted for the model
         self.outcome_mapping = {0: "died", 1: "euthanized", 2: "lived"}
-        # every encoded string will have that size
-        self.encoded_len = 89
         # contains every feature that must be encoded and the order of encoding
         self.encode_order = {
             "rectal_temp": ["numeric"],
@@ -74,99 +151,9 @@ class Encoder:
                 "displacement",
             ],
         }
-
-    # for futher integration with the bot
-    def get_features_dict(self):
-        """
-        Returns dict that contains every feature that must be encoded
-        and the order of encoding
-        """
-        return self.encode_order
-
-    def encode_records(self, records: list) -> np.array:
-        """
-        Encodes multiple records
-
-        input: list of dicts, where every dict is a record,
-            that must be encoded
-        returns: array of encoded records
-        """
-        encoded_records = None
-        # enumerating and encoding records one by one
-        for record in records:
-            encoded = self.encode_one_record(record)
-
-            if encoded_records is None:
-                encoded_records = encoded
-                continue
-
-            encoded_records = np.vstack((encoded_records, encoded))
-        return encoded_records
-
-    def encode_one_record(self, record: dict) -> np.array:
-        """
-        Encodes dict into array required for model as input
-
-        input: dict with features:
-               record = {
-                    feature1: value1,
-                    feature2: value2, ...
-               }
-        returns: encoded recorded in the array format
-                [encoded_value1] + [encoded_value2] + ...
-        """
-
-        encoded_record = np.array([])
-        # enumerate self.encode_order items for maintaining the order
-        # in which the array is filled
-        for key, possible_values in self.encode_order.items():
-            # getting a value corresponding to the feature
-            actual_value = record.get(key)
-
-            # if there is no such feature in the input dict
-            if actual_value is None:
-                encoded_value = self.__encode_null_elem(key, possible_values)
-            # if the value of the feature should be numeric
-            elif possible_values[0] == "numeric":
-                encoded_value = self.__encode_numeric_elem(
-                    key, possible_values, actual_value
-                )
-            # for lesion_1 feature there are special encoding rules
-            elif key == "lesion_1":
-                encoded_value = self.__encode_lesion(
-                    key, possible_values, str(actual_value)
-                )
-            # if the value of the feature should be categorical
-            else:
-                encoded_value = self.__encode_categorical_elem(
-                    key, possible_values, actual_value
-                )
-
-            # Checkpoint: the encoded_value array must contain at least 1 value
-            assert len(encoded_value) != 0, "Something went wrong, {key} wast encoded."
-
-            # adding new i encoded value to encoded_record array with i-1 encoded values
-            encoded_record = np.append(encoded_record, encoded_value)
-
-        # Checkpoint: the array with encoded_values must have 89 elements
-        #             at the end of the function
-        assert (
-            len(encoded_record) == self.encoded_len
-        ), "Something went wrong, try another input"
-        return encoded_record
-
-    def __encode_null_elem(self, key: str, possible_values: list) -> np.array:
-        """
-        Encodes feature that was missed in the input record
-
-        input: key - name of the missing feature
-               possible_values - list of the values that can match this feature
-        returns: array with default encoded value corresponding to this feature
-        """
-
         # if the feature was missed, we will use this values instead
         # each value corresponds to normal indicators of horse health
-        default_values = {
+        self.default_values = {
             "rectal_temp": [37.8],
             "pulse": [73],
             "respiratory_rate": [9],
@@ -219,78 +206,440 @@ class Encoder:
                 0,
             ],
         }
-        warnings.warn(f"{key}: Value was missed.")
-        encoded = np.array(default_values[key])
-        return encoded
+        if schema is not None:
+            self.encode_order = schema["encode_order"]
+            self.default_values = schema["default_values"]
+            self.outcome_mapping = schema["outcome_mapping"]
+        # every encoded string will have that size
+        self.encoded_len = sum(
+            1 if possible_values[0] == "numeric" else len(possible_values)
+            for possible_values in self.encode_order.values()
+        )
+        # feature -> slice of the encoded vector that this feature occupies,
+        # computed once from self.encode_order
+        self.column_layout = self.__build_column_layout()
+        # number of the feature in self.encode_order for every column of the encoded vector,
+        # maps contributions of the columns back to the features (see Model.explain_batch)
+        self.column_features = np.repeat(
+            np.arange(len(self.encode_order)),
+            [columns.stop - columns.start for columns in self.column_layout.values()],
+        )
+        self.column_features.flags.writeable = False
+        # encode_order compiled into immutable lookup structures
+        # that are used on the hot path of encoding
+        self.compiled = self.__compile()
+        # memoized decoding of lesion codes into columns of the encoded vector,
+        # there are only a few thousand valid codes
+        self.lesion_columns = lru_cache(maxsize=4096)(self.__lesion_columns)
+
+    def __build_column_layout(self) -> dict:
+        """
+        Computes positions of every feature in the encoded vector
 
-    def __encode_numeric_elem(
-        self, key: str, possible_values: list, actual_value: str
-    ) -> np.array:
+        returns: dict {feature: slice(start, stop)} in the order of self.encode_order
         """
-        Encodes feature must have numerica value
+        layout = {}
+        offset = 0
+        for key, possible_values in self.encode_order.items():
+            # numeric features take one column, categorical ones - one per value
+            width = 1 if possible_values[0] == "numeric" else len(possible_values)
+            layout[key] = slice(offset, offset + width)
+            offset += width
+
+        assert offset == self.encoded_len, "Something went wrong, check encode_order"
+        return layout
 
-        input: key - name of the numeric feature
-               possible_values - always [numeric]
-               actual_value - value from input record
-        returns: array with 1 numeric value
+    def __compile(self) -> tuple:
+        """
+        Compiles self.encode_order into the structures used for encoding
+
+        returns: tuple of (key, kind, columns, index, default) for every feature in order:
+                 kind - NUMERIC, CATEGORICAL or LESION
+                 columns - slice of the encoded vector
+                 index - read-only dict {value: column in the encoded vector}
+                 default - read-only float64 array used if the feature was missed
+                           (None defaults are stored as NaN)
+        """
+        compiled = []
+        for key, possible_values in self.encode_order.items():
+            columns = self.column_layout[key]
+            if possible_values[0] == "numeric":
+                kind = NUMERIC
+            elif key == "lesion_1":
+                kind = LESION
+            else:
+                kind = CATEGORICAL
+
+            index = MappingProxyType(
+                {value: columns.start + i for i, value in enumerate(possible_values)}
+            )
+            default = np.array(self.default_values.get(key, ()), dtype=np.float64)
+            if len(default) != columns.stop - columns.start:
+                raise ValueError(
+                    f"Default value of {key} must have {columns.stop - columns.start} items"
+                )
+            default.flags.writeable = False
+
+            compiled.append((key, kind, columns, index, default))
+        return tuple(compiled)
+
+    # for futher integration with the bot
+    def get_features_dict(self):
+        """
+        Returns dict that contains every feature that must be encoded
+        and the order of encoding
+        """
+        return self.encode_order
+
+    def encode_records(self, records: list, output: str = DENSE, dtype=np.float64):
+        """
+        Encodes multiple records
+
+        The records are encoded column by column into one preallocated
+        matrix; missing values that have no default are stored as NaN.
+        The result is equal to encode_one_record applied to every record
+        (float64 by default), in the warning mode warnings are emitted in the same order.
+        Large batches can be encoded into float32 (dtype) with half the memory,
+        XGBoost and CatBoost convert the input to float32 anyway.
+
+        Memory of 1M encoded records (data/*.csv resampled, ~26.5 nonzero values
+        per record, see benchmarks/memory.py), MiB:
+            dense - 340 (dtype=np.float32; float64 takes 679)
+            csr - 206 (float32 data, int32 indices)
+
+        input: records - list of dicts, where every dict is a record,
+                         that must be encoded
+               output - DENSE: np.array with shape (len(records), self.encoded_len)
+                        CSR: scipy.sparse.csr_matrix of the same shape, zeros are
+                             not stored, NaN are stored explicitly;
+                             note that XGBoost treats entries absent from a sparse
+                             matrix as missing, not as zeros, so the matrix must be
+                             densified before prediction (Model.predict_batch does it)
+               dtype - dtype of the dense matrix
+        returns: matrix of encoded records
+                 and Diagnostics with the issues of the records
+        """
+        if output == CSR:
+            return self.__encode_csr(
+                self.encode_records(records[start:start + CSR_BLOCK_SIZE], dtype=np.float32)
+                for start in range(0, len(records), CSR_BLOCK_SIZE)
+            )
+        if output != DENSE:
+            raise ValueError(f"Unknown output: {output}")
+
+        encoded_records = np.zeros((len(records), self.encoded_len), dtype=dtype)
+        diagnostics = Diagnostics(self.encode_order)
+        # warning mode: (record number, feature number, message), sorted before
+        # warning so the order matches the record-by-record encoding
+        issues = [] if self.warn else None
+
+        for position, (key, kind, columns, index, default) in enumerate(self.compiled):
+            values = [record.get(key) for record in records]
+
+            missed = [i for i, value in enumerate(values) if value is None]
+            present = [i for i, value in enumerate(values) if value is not None]
+
+            # filling missed features with the default values at once
+            if missed:
+                encoded_records[missed, columns] = default
+                diagnostics.add(position, MISSED, len(missed))
+                if issues is not None:
+                    issues.extend((i, position, f"{key}: Value was missed.") for i in missed)
+
+            if not present:
+                continue
+
+            if kind is NUMERIC:
+                skipped = self.__fill_numeric_column(
+                    encoded_records, columns.start, present, values
+                )
+                message = f"Wrong format, {key} must be numeric! Value was skiped."
+            elif kind is LESION:
+                skipped = self.__fill_lesion_column(encoded_records, present, values)
+                message = f" {key}: Wrong format, value was skiped."
+            else:
+                skipped = self.__fill_categorical_column(
+                    encoded_records, index, present, values
+                )
+                message = f" {key}: Wrong format, value was skiped."
+
+            if skipped:
+                diagnostics.add(position, INVALID, len(skipped))
+                if issues is not None:
+                    issues.extend((i, position, message) for i in skipped)
+
+        if issues:
+            self.__warn(issues)
+        return encoded_records, diagnostics
+
+    def encode_frame(self, frame, output: str = DENSE):
+        """
+        Encodes records of a DataFrame column by column, without converting rows into dicts
+
+        Equal to encode_records applied to the rows of the frame with missing values dropped.
+        Categorical columns (e.g. from models.reader.read_csv_chunks) are encoded
+        through their codes, every other column is converted to categorical first.
+
+        input: frame - pd.DataFrame, columns are the features (extra ones are ignored),
+                       missing values are NaN
+               output - DENSE or CSR, see encode_records
+        returns: float32 matrix of encoded records
+                 and Diagnostics with the issues of the records
+        """
+        import pandas as pd
+
+        if output == CSR:
+            return self.__encode_csr(
+                self.encode_frame(frame.iloc[start:start + CSR_BLOCK_SIZE])
+                for start in range(0, len(frame), CSR_BLOCK_SIZE)
+            )
+        if output != DENSE:
+            raise ValueError(f"Unknown output: {output}")
+
+        n = len(frame)
+        rows = np.arange(n)
+        encoded_records = np.zeros((n, self.encoded_len), dtype=np.float32)
+        diagnostics = Diagnostics(self.encode_order)
+        # warning mode: (record number, feature number, message), see encode_records
+        issues = [] if self.warn else None
+
+        for position, (key, kind, columns, index, default) in enumerate(self.compiled):
+            if key not in frame:
+                encoded_records[:, columns] = default
+                diagnostics.add(position, MISSED, n)
+                if issues is not None:
+                    issues.extend((i, position, f"{key}: Value was missed.") for i in rows)
+                continue
+
+            column = frame[key]
+            if kind is NUMERIC:
+                values = pd.to_numeric(column, errors="coerce").to_numpy(
+                    dtype=np.float64, na_value=np.nan
+                )
+                missed = column.isna().to_numpy()
+                # not missing, but can't be converted to number
+                skipped = np.isnan(values) & ~missed
+                present = ~missed & ~skipped
+                encoded_records[present, columns.start] = values[present]
+                message = f"Wrong format, {key} must be numeric! Value was skiped."
+            else:
+                if not isinstance(column.dtype, pd.CategoricalDtype):
+                    column = column.astype(str).where(column.notna()).astype("category")
+                categories = column.cat.categories
+                codes = column.cat.codes.to_numpy()
+                missed = codes == -1
+
+                # one hot rows of every category, relative to the first column
+                hot = np.zeros((len(categories) + 1, columns.stop - columns.start), np.float32)
+                for code, value in enumerate(categories):
+                    if kind is LESION:
+                        hit = self.lesion_columns(str(value))
+                    else:
+                        hit = [index[value]] if value in index else []
+                    hot[code, [c - columns.start for c in hit]] = 1
+                unknown = ~hot.any(axis=1)
+                # the last row is taken by code -1 of missing values
+                unknown[-1] = False
+
+                skipped = unknown[codes]
+                present = ~missed & ~skipped
+                encoded_records[present, columns] = hot[codes[present]]
+                message = f" {key}: Wrong format, value was skiped."
+
+            encoded_records[missed, columns] = default
+            diagnostics.add(position, MISSED, np.count_nonzero(missed))
+            diagnostics.add(position, INVALID, np.count_nonzero(skipped))
+            if issues is not None:
+                issues.extend((i, position, f"{key}: Value was missed.") for i in rows[missed])
+                issues.extend((i, position, message) for i in rows[skipped])
+
+        if issues:
+            self.__warn(issues)
+        return encoded_records, diagnostics
+
+    @staticmethod
+    def __warn(issues: list) -> None:
+        """
+        Emits warnings about (record number, feature number, message) issues
+        in the order of the record-by-record encoding
+        """
+        issues.sort()
+        for _, _, message in issues:
+            warnings.warn(message)
+
+    def __encode_csr(self, encoded_blocks) -> tuple:
+        """
+        Stacks blocks of CSR_BLOCK_SIZE encoded records into CSR matrix,
+        so only one block is dense at once
+
+        input: encoded_blocks - iterator over (dense matrix, Diagnostics) of every block
+        returns: CSR matrix and Diagnostics of all the records
+        """
+        from scipy import sparse
+
+        diagnostics = Diagnostics(self.encode_order)
+        blocks = []
+        for block, block_diagnostics in encoded_blocks:
+            blocks.append(sparse.csr_matrix(block))
+            diagnostics.update(block_diagnostics)
+        if not blocks:
+            return sparse.csr_matrix((0, self.encoded_len), dtype=np.float32), diagnostics
+        return sparse.vstack(blocks, format="csr", dtype=np.float32), diagnostics
+
+    def __fill_numeric_column(
+        self, encoded_records: np.array, column: int, rows: list, values: list
+    ) -> list:
+        """
+        Fills numeric feature column for the given rows
+
+        input: encoded_records - matrix to fill
+               column - position of the feature in the encoded vector
+               rows - numbers of the records that have this feature
+               values - values of the feature for every record
+        returns: numbers of the records that were skipped because of the wrong format
         """
-        # value must have a float conversion
-        # if it can't be converted, then the input was incorrect
         try:
-            encoded = np.array([float(actual_value)])
+            numbers = np.array([values[i] for i in rows], dtype=np.float64)
+            skipped = []
         except ValueError:
-            warnings.warn(f"Wrong format, {key} must be numeric! Value was skiped.")
-            encoded = np.zeros(len(possible_values)).astype(np.float16)
-        return encoded
+            # at least one value can't be converted, fall back to one by one conversion
+            numbers = np.zeros(len(rows), dtype=np.float64)
+            skipped = []
+            for j, i in enumerate(rows):
+                try:
+                    numbers[j] = float(values[i])
+                except ValueError:
+                    skipped.append(i)
+
+        encoded_records[rows, column] = numbers
+        return skipped
+
+    def __fill_categorical_column(
+        self, encoded_records: np.array, index: dict, rows: list, values: list
+    ) -> list:
+        """
+        One hot encoding of categorical feature for the given rows
 
-    def __encode_categorical_elem(
-        self, key: str, posible_values: list, actual_value: str
-    ) -> np.array:
+        input: encoded_records - matrix to fill
+               index - compiled {value: column in the encoded vector} of the feature
+               rows - numbers of the records that have this feature
+               values - values of the feature for every record
+        returns: numbers of the records that were skipped because of the wrong format
         """
-        One hot encoding for categorical feature
+        codes = np.array([index.get(values[i], -1) for i in rows], dtype=np.intp)
+        rows = np.array(rows, dtype=np.intp)
 
-        input: key - name of the missing feature
-               possible_values - list of the values that can match this feature
-               actual_value - value from input record
-        returns: array with 1 numeric value
+        known = codes >= 0
+        encoded_records[rows[known], codes[known]] = 1
+        return rows[~known].tolist()
 
-        Example:
-                possible_values: [normal, not_normal, smth]
-                actual_value: not_normal
-                returns: [0, 1, 0]
+    def __fill_lesion_column(
+        self, encoded_records: np.array, rows: list, values: list
+    ) -> list:
+        """
+        Encodes lesion_1 feature for the given rows
+
+        input: encoded_records - matrix to fill
+               rows - numbers of the records that have this feature
+               values - values of the feature for every record
+        returns: numbers of the records that were skipped because of the wrong format
+        """
+        hit_rows, hit_columns, skipped = [], [], []
+        for i in rows:
+            # decoding numeric code into the columns of lesion features
+            columns = self.lesion_columns(str(values[i]))
+            if not columns:
+                skipped.append(i)
+                continue
+            hit_rows.extend([i] * len(columns))
+            hit_columns.extend(columns)
+
+        encoded_records[hit_rows, hit_columns] = 1
+        return skipped
+
+    def encode_one_record(self, record: dict, diagnostics: Diagnostics = None) -> np.array:
+        """
+        Encodes dict into array required for model as input
+
+        input: dict with features:
+               record = {
+                    feature1: value1,
+                    feature2: value2, ...
+               }
+               diagnostics - optional Diagnostics to count the issues of the record in
+        returns: encoded recorded in the float64 array format
+                [encoded_value1] + [encoded_value2] + ...
+                missing values that have no default are stored as NaN
         """
+        # every feature is written into its columns of the preallocated row
+        encoded_record = np.zeros(self.encoded_len)
 
-        posible_values = np.array(posible_values)
-        # creates mask of possible_values that has 1 at the position
-        # where posible_values element matches the actual_value and 0 at the other
-        encoded = np.in1d(posible_values, actual_value).astype(np.float16)
+        for position, (key, kind, columns, index, default) in enumerate(self.compiled):
+            # getting a value corresponding to the feature
+            actual_value = record.get(key)
 
-        # if the actual_value can not be found in the posible_values array
-        if not any(encoded):
-            warnings.warn(f" {key}: Wrong format, value was skiped.")
-        return encoded
+            # if there is no such feature in the input dict
+            if actual_value is None:
+                self.__report(diagnostics, position, MISSED, f"{key}: Value was missed.")
+                encoded_record[columns] = default
+            # value must have a float conversion
+            # if it can't be converted, then the input was incorrect
+            elif kind is NUMERIC:
+                try:
+                    encoded_record[columns.start] = float(actual_value)
+                except ValueError:
+                    self.__report(
+                        diagnostics,
+                        position,
+                        INVALID,
+                        f"Wrong format, {key} must be numeric! Value was skiped.",
+                    )
+            # for lesion_1 feature there are special encoding rules
+            elif kind is LESION:
+                lesion_columns = self.lesion_columns(str(actual_value))
+                if not lesion_columns:
+                    self.__report(
+                        diagnostics, position, INVALID, f" {key}: Wrong format, value was skiped."
+                    )
+                encoded_record[list(lesion_columns)] = 1
+            # one hot encoding for categorical feature
+            else:
+                column = index.get(actual_value)
+                if column is None:
+                    self.__report(
+                        diagnostics, position, INVALID, f" {key}: Wrong format, value was skiped."
+                    )
+                else:
+                    encoded_record[column] = 1
+
+        return encoded_record
 
-    def __encode_lesion(
-        self, key: str, possible_values: list, actual_value: str
-    ) -> np.array:
+    def __report(
+        self, diagnostics: Diagnostics, position: int, issue: int, message: str
+    ) -> None:
         """
-        Encodes lesion_1 feature
+        Counts the issue of one record and warns about it in the warning mode
+        """
+        if diagnostics is not None:
+            diagnostics.add(position, issue)
+        if self.warn:
+            warnings.warn(message)
 
-        input: key - always lesion_1
-               possible_values - list with details of the lesion
-               actual_value - numeric code with 4-5 digits in which the details of the lesion are encoded
-        returns: array with encoded lesion
+    def __lesion_columns(self, code: str) -> tuple:
         """
+        Decodes lesion code into columns of the encoded vector
 
-        posible_values = np.array(possible_values)
-        # decoding numeric code into multiple lesion features
-        relevant_values = np.array(self.__split_lesion(actual_value))
-        # one hot encoding for lesion features
-        encoded = np.in1d(posible_values, relevant_values).astype(np.float16)
-        # if actual_value was in wrong format
-        if not any(encoded):
-            warnings.warn(f" {key}: Wrong format, value was skiped.")
-        return encoded
+        input: code - numeric code with 4-5 digits in which the details of the lesion are encoded
+        returns: tuple of columns that must be set to 1,
+                 empty if the code can't be decoded
+        """
+        index = next(index for _, kind, _, index, _ in self.compiled if kind is LESION)
+        try:
+            details = self.__split_lesion(code)
+        except IndexError:
+            # code is too short, e.g. "37"
+            return ()
+        return tuple(sorted({index[detail] for detail in details if detail in index}))
 
     def __split_lesion(self, code: str) -> list:
         """
@@ -307,48 +656,6 @@ class Encoder:
              input: 2209
              returns: [sm_intestine, strangulation, none, lipoma/slenic_incarceration]
         """
-        # first digit of the input code
-        lesion_site = {
-            "1": "gastric",
-            "2": "sm_intestine",
-            "3": "lg_colon",
-            "4": "lg_colon_and_cecum",
-            "5": "cecum",
-            "6": "transverse_colon",
-            "7": "retum/descending_colon",
-            "8": "uterus",
-            "9": "bladder",
-            "11": "all_intestinal_sites",
-            "00": "none",
-        }
-        # second digit of the input code
-        lesion_type = {
-            "1": "simple",
-            "2": "strangulation",
-            "3": "inflammation",
-            "4": "other",
-            "0": "none",
-        }
-        # third digit of the input code
-        lesion_subtype = {
-            "1": "mechanical",
-            "2": "paralytic",
-            "0": "none",
-        }
-        # fourth digit of the input code
-        lesion_specific_code = {
-            "1": "obturation",
-            "2": "intrinsic",
-            "3": "extrinsic",
-            "4": "adynamic",
-            "5": "volvulus/torsion",
-            "6": "intussuption",
-            "7": "thromboembolic",
-            "8": "hernia",
-            "9": "lipoma/slenic_incarceration",
-            "10": "displacement",
-            "0": "none",
-        }
         if code[:2] in ["00", "11"]:
             site, type, subtype, s_code = code[:2], code[2], code[3], code[4:]
         elif code[0] == "0":
@@ -357,8 +664,8 @@ class Encoder:
             site, type, subtype, s_code = code[0], code[1], code[2], code[3:]
 
         return [
-            lesion_site.get(site, "none"),
-            lesion_type.get(type, "none"),
-            lesion_subtype.get(subtype, "none"),
-            lesion_specific_code.get(s_code, "none"),
+            LESION_SITE.get(site, "none"),
+            LESION_TYPE.get(type, "none"),
+            LESION_SUBTYPE.get(subtype, "none"),
+            LESION_SPECIFIC_CODE.get(s_code, "none"),
         ]
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# extensions of the XGBoost native model formats
+NATIVE_FORMATS = (".ubj", ".json")
+
+
+def convert_pickle(pickle_path: str, output_path: str) -> str:
+    """
+    Converts pickled XGBoost model into the XGBoost native format
+
+    input: pickle_path - path to the pickled XGBClassifier or Booster,
+                         e.g. saved_models/xgb.pickle
+           output_path - path to the converted model, the format is chosen
+                         by the extension: .ubj (binary) or .json
+    returns: output_path
+    """
+    if not output_path.endswith(NATIVE_FORMATS):
+        raise ValueError(f"output_path must end with one of {NATIVE_FORMATS}")
+
+    with open(pickle_path, "rb") as f:
+        model = pickle.load(f)
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster.save_model(output_path)
+    return output_path
+
+
+class BoosterClassifier:
+    """
+    Classifier on top of xgboost.Booster loaded from the native format
+
+    Has the same predict/predict_proba interface as XGBClassifier,
+    but doesn't need sklearn and predicts with inplace_predict,
+    without building DMatrix.
+    The booster is loaded on the first use if lazy is True.
+    """
+
+    def __init__(self, path: str, lazy: bool = True) -> None:
+        """
+        input: path - path to the model in the native format (.ubj or .json)
+               lazy - load the model on the first prediction instead of now
+        """
+        self.path = path
+        self.load_stats = {}
+        self._booster = None
+        self._objective = None
+        self._lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    @property
+    def booster(self):
+        """
+        Loaded xgboost.Booster
+        """
+        if self._booster is None:
+            return self.load()
+        return self._booster
+
+    def load(self):
+        """
+        Loads the booster if it wasn't loaded yet
+
+        returns: xgboost.Booster
+        """
+        with self._lock:
+            if self._booster is None:
+                self.__load()
+        return self._booster
+
+    def __load(self) -> None:
+        import xgboost
+
+        start = time.perf_counter()
+        booster = xgboost.Booster(model_file=self.path)
+        loaded = time.perf_counter()
+        config = json.loads(booster.save_config())
+        self._objective = config["learner"]["objective"]["name"]
+
+        self.load_stats = {
+            "path": self.path,
+            "size_bytes": os.path.getsize(self.path),
+            "load_seconds": loaded - start,
+            "total_seconds": time.perf_counter() - start,
+        }
+        logger.info("Model loaded: %s", self.load_stats)
+        self._booster = booster
+
+    def predict_proba(self, X: np.array) -> np.array:
+        """
+        returns: probabilities of every class with shape (n, number of classes)
+        """
+        margin = self.booster.inplace_predict(X, predict_type="margin")
+
+        if self._objective.startswith("multi:"):
+            # softmax, the same as XGBClassifier.predict_proba does
+            exp = np.exp(margin - margin.max(axis=1, keepdims=True))
+            return exp / exp.sum(axis=1, keepdims=True)
+        if self._objective == "binary:logistic":
+            p = 1 / (1 + np.exp(-margin))
+            return np.vstack((1 - p, p)).T
+
+        raise ValueError(f"Objective {self._objective} is not supported")
+
+    def predict(self, X: np.array) -> np.array:
+        return self.predict_proba(X).argmax(axis=1)
+
+    def get_booster(self):
+        return self.booster
+
+
+def load_model(path: str, lazy: bool = True, backend: str = "xgboost"):
+    """
+    Loads model from the file
+
+    input: path - path to the model:
+                  .ubj/.json - XGBoost native format, see convert_pickle
+                  anything else - pickled model
+           lazy - for the native formats: load the model on the first prediction
+           backend - xgboost: predict with the loaded model itself
+                     compiled: compile the trees into numpy arrays,
+                               see models.tree_predictor.CompiledTrees
+    returns: model with predict and predict_proba methods
+    """
+    if backend == "compiled":
+        from models.tree_predictor import CompiledTrees
+
+        start = time.perf_counter()
+        model = CompiledTrees(load_model(path, lazy=False))
+        logger.info(
+            "Model compiled: %s",
+            {"path": path, "compile_seconds": time.perf_counter() - start},
+        )
+        return model
+    if backend != "xgboost":
+        raise ValueError(f"Unknown backend: {backend}")
+
+    if path.endswith(NATIVE_FORMATS):
+        return BoosterClassifier(path, lazy)
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+    logger.info(
+        "Model loaded: %s",
+        {"path": path, "load_seconds": time.perf_counter() - start},
+    )
+    return model
@@ -1,15 +1,59 @@
 import warnings
 
-from models.encoder import Encoder
+import numpy as np
+
+from models.cache import PredictionCache
+from models.diagnostics import MISSED, Diagnostics
+from models.encoder import CSR_BLOCK_SIZE, Encoder
+from models.loader import load_model
+from monitoring.metrics import REGISTRY
 
 
 class Model:
-    def __init__(self, model=None) -> None:
-        # to encode input into format that required for model prediction
-        self.encoder = Encoder()
-        # takes as input a model with predict and predict_proba methods
+    def __init__(
+        self, model=None, cache: PredictionCache = None, encoder: Encoder = None
+    ) -> None:
+        # to encode input into format that required for model prediction,
+        # the horse schema unless the encoder of another species is given
+        self.encoder = encoder or Encoder()
+        # optional cache of predictions keyed by encoded records
+        self.cache = cache
+        # takes as input a model with predict_proba method
         self.model = model
 
+    @property
+    def model(self):
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+        # cached predictions were made by the previous model
+        if self.cache is not None:
+            self.cache.clear()
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        cache: PredictionCache = None,
+        lazy: bool = True,
+        backend: str = "xgboost",
+        encoder: Encoder = None,
+    ) -> "Model":
+        """
+        Creates Model with the model from the file
+
+        input: path - path to the model: pickled (e.g. saved_models/xgb.pickle)
+                      or XGBoost native format (.ubj/.json), see models.loader
+               cache - optional cache of predictions
+               lazy - for the native formats: load the model on the first prediction
+               backend - xgboost or compiled, see models.loader.load_model
+               encoder - encoder of the species the model was trained for, None - horse
+        returns: Model
+        """
+        return cls(load_model(path, lazy, backend), cache, encoder)
+
     def get_features_dict(self):
         """
         Returns dict that contains every feature that must be encoded
@@ -21,36 +65,248 @@ class Model:
         """
         Predict class baed on the input feature vector
 
-        input: X - feature vector, can be list or dict
-               if X is a dict, returns only one class for one record
-               if X is a list, function returns many classes - one for each record
+        input: X - feature vector, can be list or dict,
+                   or already encoded record(s) - array with shape (encoded_len,)
+                   or (n, encoded_len)
+               if X is a dict or 1-d array, returns only one class for one record
+               if X is a list or 2-d array, function returns many classes - one for each record
         returns: predicted class and a corresponding probability
+                 (probability of lived for lived, of died or euthanized otherwise),
+                 for a list - one probability for each record
+        """
+        if self.model is None:
+            warnings.warn("Model is not defined! Load the model first")
+            return
+
+        y, proba = self.predict_batch(self.__encode_input(X), class_names=False)
+        p = self.__outcome_probability(y, proba)
+
+        if class_names:
+            y = [self.encoder.outcome_mapping[i] for i in y]
+
+        if isinstance(X, dict) or (isinstance(X, np.ndarray) and X.ndim == 1):
+            return y, p[0]
+        return y, p
+
+    def explain(self, X, class_names=True, top=3, approximate=False):
+        """
+        Predict class as predict does and the features
+        that contributed the most to every prediction
+
+        input: X, class_names - see predict
+               top, approximate - see explain_batch
+        returns: predicted class, probability (see predict) and
+                 list of (feature, contribution) sorted by contribution (see explain_batch),
+                 for a list of records - one such list for each record
         """
         if self.model is None:
             warnings.warn("Model is not defined! Load the model first")
             return
 
-        # encode input into format that required for model prediction
-        if isinstance(X, dict):
-            encoded_X = self.encoder.encode_one_record(X).reshape((1, -1))
-        elif isinstance(X, list):
-            encoded_X = self.encoder.encode_records(X)
+        y, proba, features, contributions = self.explain_batch(
+            self.__encode_input(X), class_names=False, top=top, approximate=approximate
+        )
+        p = self.__outcome_probability(y, proba)
+        contributors = [
+            list(zip(names.tolist(), values.tolist()))
+            for names, values in zip(features, contributions)
+        ]
+
+        if class_names:
+            y = [self.encoder.outcome_mapping[i] for i in y]
+
+        if isinstance(X, dict) or (isinstance(X, np.ndarray) and X.ndim == 1):
+            return y, p[0], contributors[0]
+        return y, p, contributors
+
+    def predict_batch(self, X, class_names=True):
+        """
+        Predict classes and probabilities of every class for many records
+        with a single model pass
+
+        input: X - list of dicts or already encoded array
+               with shape (n, encoded_len), dense or sparse
+               (see Encoder.encode_records)
+        returns: array of predicted classes - one for each record
+                 and array of probabilities with shape (n, number of classes)
+        """
+        if self.model is None:
+            warnings.warn("Model is not defined! Load the model first")
+            return
+
+        if isinstance(X, list):
+            proba = self.__predict_encoded(self.__encode(X))
+        elif isinstance(X, np.ndarray):
+            proba = self.__predict_encoded(X.reshape((-1, self.encoder.encoded_len)))
+        elif hasattr(X, "tocsr"):
+            # absent entries of a sparse matrix are zeros for the encoder,
+            # but missing values for XGBoost, so it is densified block by block
+            X = X.tocsr()
+            proba = np.vstack(
+                [
+                    self.__predict_encoded(X[start:start + CSR_BLOCK_SIZE].toarray())
+                    for start in range(0, X.shape[0], CSR_BLOCK_SIZE)
+                ]
+                or [np.empty((0, len(self.encoder.outcome_mapping)))]
+            )
         else:
-            raise ValueError("X must be list or dict")
+            raise ValueError("X must be list, np.ndarray or sparse matrix")
 
-        # prediction
-        try:
-            y = self.model.predict(encoded_X)
-            p = self.model.predict_proba(encoded_X)
-            if y[0] == 2:
-                p = p[0][2]
+        # the class is the most probable one
+        y = proba.argmax(axis=1)
+        REGISTRY.inc("predictions_total", len(y))
+
+        if class_names:
+            y = np.array([self.encoder.outcome_mapping[i] for i in y])
+
+        return y, proba
+
+    def explain_batch(self, X, class_names=True, top=3, approximate=False):
+        """
+        predict_batch with the features that contributed the most to every prediction
+
+        Contributions are SHAP values of XGBoost (pred_contribs) or CatBoost (ShapValues)
+        computed for all records with a single call, in the margin of the predicted class:
+        positive values are in favour of the predicted class, negative - against it.
+        Contributions of the encoded columns are summed up into the features
+        of Encoder.encode_order with Encoder.column_features.
+        Exact SHAP values of deep ensembles cost much more than prediction
+        (xgb.pickle on one core: ~14 ms per record, ~200x predict_batch of 1000 records,
+        ~7x predict of one record); approximate ones (Saabas method for XGBoost)
+        cost ~7x predict_batch of 1000 records and ~2x predict of one record,
+        see benchmarks/run.py (explain, explain_approximate).
+
+        input: X - see predict_batch
+               class_names - see predict_batch
+               top - number of the features for every record
+               approximate - approximate contributions instead of exact SHAP values
+        returns: array of predicted classes, array of probabilities (see predict_batch),
+                 array of feature names with shape (n, top), sorted by contribution
+                 and array of their contributions with the same shape
+        """
+        if self.model is None:
+            warnings.warn("Model is not defined! Load the model first")
+            return
+
+        if isinstance(X, list):
+            encoded_X = self.__encode(X)
+        elif isinstance(X, np.ndarray):
+            encoded_X = X.reshape((-1, self.encoder.encoded_len))
+        elif hasattr(X, "tocsr"):
+            encoded_X = X.toarray()
+        else:
+            raise ValueError("X must be list, np.ndarray or sparse matrix")
+
+        proba = self.__predict_encoded(encoded_X)
+        y = proba.argmax(axis=1)
+        REGISTRY.inc("predictions_total", len(y))
+
+        with REGISTRY.span("explain"):
+            # contributions of the columns to the predicted class, without the bias
+            contributions = self.__predict_contributions(encoded_X, approximate)
+            columns = contributions[np.arange(len(y)), y, :-1]
+            names = list(self.encoder.encode_order)
+            one_hot = np.eye(len(names), dtype=columns.dtype)[self.encoder.column_features]
+            by_feature = columns @ one_hot
+            order = np.argsort(-by_feature, axis=1, kind="stable")[:, :top]
+
+        features = np.array(names, dtype=object)[order]
+        contributions = np.take_along_axis(by_feature, order, axis=1)
+
+        if class_names:
+            y = np.array([self.encoder.outcome_mapping[i] for i in y])
+
+        return y, proba, features, contributions
+
+    def __encode_input(self, X) -> np.array:
+        """
+        Encodes input of predict into format that required for model prediction
+        """
+        if isinstance(X, np.ndarray):
+            return X.reshape((-1, self.encoder.encoded_len))
+        if isinstance(X, (dict, list)):
+            return self.__encode(X)
+        raise ValueError("X must be list, dict or np.ndarray")
+
+    @staticmethod
+    def __outcome_probability(y: np.array, proba: np.array) -> np.array:
+        """
+        Probability of lived for lived, of died or euthanized otherwise
+        """
+        return np.where(y == 2, proba[:, 2], proba[:, :2].sum(axis=1))
+
+    def __predict_contributions(self, encoded_X: np.array, approximate: bool) -> np.array:
+        """
+        returns: SHAP values with shape (n, number of classes, encoded_len + 1),
+                 the last column is the bias
+        """
+        if hasattr(self.model, "get_booster"):
+            import xgboost
+
+            contributions = self.model.get_booster().predict(
+                xgboost.DMatrix(encoded_X, missing=np.nan),
+                pred_contribs=True,
+                approx_contribs=approximate,
+                validate_features=False,
+            )
+        elif hasattr(self.model, "get_feature_importance"):
+            import catboost
+
+            contributions = self.model.get_feature_importance(
+                catboost.Pool(encoded_X),
+                type="ShapValues",
+                shap_calc_type="Approximate" if approximate else "Regular",
+            )
+        else:
+            raise ValueError("Only XGBoost and CatBoost models can explain predictions")
+
+        if contributions.ndim == 2:
+            # binary objective: contributions to the margin of the positive class
+            contributions = np.stack((-contributions, contributions), axis=1)
+        return contributions
+
+    def __predict_encoded(self, encoded_X: np.array) -> np.array:
+        with REGISTRY.span("model"):
+            if self.cache is None:
+                return self.__predict_proba(encoded_X)
+            return self.__predict_proba_cached(encoded_X)
+
+    def __encode(self, X) -> np.array:
+        """
+        Encodes dict or list of dicts into array with shape (n, encoded_len)
+        """
+        with REGISTRY.span("encode"):
+            if isinstance(X, dict):
+                diagnostics = Diagnostics(self.encoder.encode_order)
+                encoded_X = self.encoder.encode_one_record(X, diagnostics).reshape((1, -1))
             else:
-                p = p[0][:2].sum()
+                # float32: the model converts the input to it anyway, with half the memory
+                encoded_X, diagnostics = self.encoder.encode_records(X, dtype=np.float32)
+
+        # features that were filled with the default values
+        REGISTRY.inc("missing_features_total", diagnostics.total(MISSED))
+        return encoded_X
 
+    def __predict_proba(self, encoded_X: np.array) -> np.array:
+        try:
+            return self.model.predict_proba(encoded_X)
         except AttributeError:
-            raise AttributeError("Model must have predict and predict_proba methods")
+            raise AttributeError("Model must have predict_proba method")
 
-        if class_names:
-            y = [self.encoder.outcome_mapping[i] for i in y]
+    def __predict_proba_cached(self, encoded_X: np.array) -> np.array:
+        """
+        predict_proba that takes known records from self.cache
+        and runs the model only for the rest of them
+        """
+        keys = [self.cache.key(row) for row in encoded_X]
+        cached = [self.cache.get(key) for key in keys]
+        missed = [i for i, proba in enumerate(cached) if proba is None]
 
-        return y, p
+        if missed:
+            missed_proba = self.__predict_proba(encoded_X[missed])
+            for i, proba in zip(missed, missed_proba):
+                proba.flags.writeable = False
+                self.cache.put(keys[i], proba)
+                cached[i] = proba
+
+        return np.vstack(cached)
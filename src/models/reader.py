@@ -0,0 +1,86 @@
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from models.encoder import Encoder
+
+
+# category of the values that are not in Encoder.encode_order,
+# Encoder.encode_frame skips them with a warning as encode_records does
+UNKNOWN = "<unknown>"
+
+
+def categorical_dtypes(encoder: Encoder) -> dict:
+    """
+    Categorical dtypes of the categorical features
+
+    returns: dict {feature: pd.CategoricalDtype} with the values of
+             encoder.encode_order and UNKNOWN as categories,
+             the order of the categories is the order of the encoded columns
+    """
+    return {
+        key: pd.CategoricalDtype([*possible_values, UNKNOWN])
+        for key, possible_values in encoder.get_features_dict().items()
+        if possible_values[0] != "numeric" and key != "lesion_1"
+    }
+
+
+def read_csv_chunks(
+    path: str, chunksize: int = 10000, encoder: Encoder = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads csv file with the records of clinics in chunks of chunksize rows
+
+    Categorical features get fixed categorical dtypes (int8 codes) derived from
+    encoder.encode_order, see categorical_dtypes; lesion_1 is categorical with
+    the codes as strings; numeric features are float32.
+    The chunks can be encoded with Encoder.encode_frame without converting
+    rows into dicts, so files of any size are processed in constant memory.
+
+    input: path - path to the csv file, e.g. data/test.csv
+           chunksize - number of rows in every chunk
+           encoder - encoder that defines the features
+    returns: iterator over DataFrames
+    """
+    encoder = encoder or Encoder()
+    features = encoder.get_features_dict()
+    dtypes = categorical_dtypes(encoder)
+    # categories are parsed as strings and inferred for every chunk,
+    # then mapped onto the fixed categories
+    read_dtypes = {key: "category" for key in dtypes}
+    read_dtypes["lesion_1"] = "category"
+
+    numeric = [key for key, values in features.items() if values[0] == "numeric"]
+    with pd.read_csv(path, chunksize=chunksize, dtype=read_dtypes) as chunks:
+        for chunk in chunks:
+            for key, dtype in dtypes.items():
+                if key in chunk:
+                    chunk[key] = recode(chunk[key], dtype)
+            for key in numeric:
+                if key in chunk and pd.api.types.is_numeric_dtype(chunk[key]):
+                    chunk[key] = chunk[key].astype(np.float32)
+            yield chunk
+
+
+def recode(column: pd.Series, dtype: pd.CategoricalDtype) -> pd.Series:
+    """
+    Maps categorical column onto the fixed categories of dtype,
+    the values that are not in dtype.categories become UNKNOWN
+
+    input: column - categorical column with inferred categories
+           dtype - target dtype, its last category must be UNKNOWN
+    returns: column with dtype
+    """
+    target = {value: code for code, value in enumerate(dtype.categories)}
+    unknown = target[UNKNOWN]
+    # inferred category code -> target code,
+    # the last element maps the code of missing values -1 onto itself
+    mapping = np.array(
+        [target.get(value, unknown) for value in column.cat.categories] + [-1],
+        dtype=np.int8,
+    )
+    codes = mapping[column.cat.codes.to_numpy()]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, dtype=dtype), index=column.index, name=column.name
+    )
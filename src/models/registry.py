@@ -0,0 +1,365 @@
+from collections import Counter
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+from models.model import Model
+from monitoring.metrics import REGISTRY
+
+
+logger = logging.getLogger(__name__)
+
+# sizes of the batches predicted by a new model before it takes traffic
+WARMUP_BATCH_SIZES = (1, 32)
+
+
+def file_version(path: str) -> tuple:
+    """
+    returns: (modification time, size) of the file, changes when the file is replaced
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _Slot:
+    """
+    Model loaded from one file and the version of the file it was loaded from
+    """
+
+    def __init__(self, name: str, path: str) -> None:
+        self.name = name
+        self.path = path
+        # label of the model in the metrics
+        self.label = os.path.basename(path)
+        # (model, version of the file) replaced with a single assignment on reload,
+        # so a request never pairs the new model with the old version
+        self.serving = (None, None)
+        self.loaded_at = None
+        self.reloads = 0
+        self.failures = 0
+
+    @property
+    def model(self) -> Model:
+        return self.serving[0]
+
+    @property
+    def version(self) -> tuple:
+        return self.serving[1]
+
+
+class Routed(tuple):
+    """
+    Result of a ModelRegistry call: the same tuple Model returns, and in models -
+    the model that produced every record, "label@version" (see ModelRegistry.version),
+    a list in the order of the classes (the first item of the tuple)
+    """
+
+    def __new__(cls, result, models: list) -> "Routed":
+        routed = super().__new__(cls, result)
+        routed.models = models
+        return routed
+
+
+def served_by(result, model=None) -> list:
+    """
+    Models that produced the records of a result of predict/explain
+
+    input: result - result of ModelRegistry (Routed) or of Model
+           model - model that returned the result; for Model results
+                   its version attribute is used, if any
+    returns: "label@version" (or None) for every record of the result
+    """
+    models = getattr(result, "models", None)
+    if models is not None:
+        return models
+    return [getattr(model, "version", None)] * len(result[0])
+
+
+class ModelRegistry:
+    """
+    Models that are reloaded when their files change
+
+    The primary model serves the traffic, the optional candidate model
+    gets candidate_share of the records (A/B routing, e.g. xgb vs CatBoost).
+    A background thread watches the model files; a changed file is loaded
+    and warmed up in that thread, then the new model replaces the old one
+    with a single assignment, so requests are never blocked by loading.
+    If the new version can't be loaded, the old one keeps serving.
+
+    Has the same encoder/get_features_dict/predict/predict_batch/explain/explain_batch
+    interface as Model,
+    so it can be used instead of Model in BatchScheduler and model_inference.process;
+    the results are Routed: they also name the model of every record (see served_by).
+    Latency and outcomes of every model are recorded in monitoring.metrics.REGISTRY:
+    model_seconds{model=...} and model_outcomes_total{model=..., outcome=...}.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        load: Callable[[str], Model] = Model.load,
+        candidate_path: str = None,
+        candidate_share: float = 0.0,
+    ) -> None:
+        """
+        input: path - file of the primary model
+               load - creates Model from the file, e.g. with a prediction cache
+               candidate_path - file of the candidate model, None - no A/B routing
+               candidate_share - share of the records routed to the candidate, 0..1
+        """
+        if not 0 <= candidate_share <= 1:
+            raise ValueError("candidate_share must be between 0 and 1")
+
+        self.load = load
+        self.candidate_share = candidate_share if candidate_path else 0.0
+        self.primary = _Slot("primary", path)
+        self.candidate = _Slot("candidate", candidate_path) if candidate_path else None
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # the models must be ready before the first request
+        for slot in self.slots:
+            if not self.__reload(slot):
+                raise RuntimeError(f"Can't load the {slot.name} model from {slot.path}")
+
+    @property
+    def slots(self) -> list:
+        return [slot for slot in (self.primary, self.candidate) if slot is not None]
+
+    @property
+    def encoder(self):
+        return self.primary.model.encoder
+
+    def get_features_dict(self):
+        return self.primary.model.get_features_dict()
+
+    @property
+    def version(self) -> str:
+        """
+        returns: files and modification times (ns) of the serving models and the candidate share,
+                 e.g. "xgb.pickle@1700000000000000000"
+                 or "xgb.pickle@1700000000000000000 + cat.pickle@1700000500000000000 (10%)"
+        """
+        versions = [_served(slot.label, slot.version) for slot in self.slots]
+        if self.candidate is None:
+            return versions[0]
+        return f"{versions[0]} + {versions[1]} ({self.candidate_share:.0%})"
+
+    def start(self, interval: float = 5.0) -> "ModelRegistry":
+        """
+        Starts the background thread that checks the model files every interval seconds
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._watch, args=(interval,), name="model-registry", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _watch(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            self.reload()
+
+    def reload(self) -> list:
+        """
+        Loads the models whose files have changed since they were loaded
+
+        returns: names of the reloaded models
+        """
+        reloaded = []
+        for slot in self.slots:
+            try:
+                changed = file_version(slot.path) != slot.version
+            except OSError:
+                # the file is being replaced
+                continue
+            if changed and self.__reload(slot):
+                reloaded.append(slot.name)
+        return reloaded
+
+    def __reload(self, slot: _Slot) -> bool:
+        start = time.perf_counter()
+        try:
+            version = file_version(slot.path)
+            model = self.load(slot.path)
+            self.__warm_up(model)
+        except Exception:
+            slot.failures += 1
+            logger.exception("Can't load the %s model from %s", slot.name, slot.path)
+            return False
+
+        # the new model takes traffic, requests in flight finish with the old one
+        slot.serving = (model, version)
+        slot.loaded_at = time.time()
+        slot.reloads += 1
+        logger.info(
+            "Model %s loaded: %s",
+            slot.name,
+            {"path": slot.path, "seconds": time.perf_counter() - start},
+        )
+        return True
+
+    @staticmethod
+    def __warm_up(model: Model) -> None:
+        """
+        Predicts batches of records with the default values, so lazy loading,
+        memory allocation and the first calls of the model happen before it takes traffic
+        """
+        row = np.concatenate([default for *_, default in model.encoder.compiled])
+        for size in WARMUP_BATCH_SIZES:
+            model.predict_batch(np.tile(row, (size, 1)).astype(np.float32))
+
+    def route(self) -> _Slot:
+        """
+        returns: slot that serves the next record
+        """
+        if self.candidate_share and random.random() < self.candidate_share:
+            return self.candidate
+        return self.primary
+
+    def predict(self, X, class_names=True):
+        """
+        Model.predict of the routed model(s), see Model.predict
+        """
+        if isinstance(X, dict) or (isinstance(X, np.ndarray) and X.ndim == 1):
+            return self.__call(self.route(), "predict", X, class_names)
+        return self.__split("predict", X, class_names)
+
+    def predict_batch(self, X, class_names=True):
+        """
+        Model.predict_batch of the routed model(s), see Model.predict_batch
+        """
+        return self.__split("predict_batch", X, class_names)
+
+    def explain(self, X, class_names=True, top=3, approximate=False):
+        """
+        Model.explain of the routed model(s), see Model.explain
+        """
+        options = {"top": top, "approximate": approximate}
+        if isinstance(X, dict) or (isinstance(X, np.ndarray) and X.ndim == 1):
+            return self.__call(self.route(), "explain", X, class_names, **options)
+        return self.__split("explain", X, class_names, **options)
+
+    def explain_batch(self, X, class_names=True, top=3, approximate=False):
+        """
+        Model.explain_batch of the routed model(s), see Model.explain_batch
+        """
+        return self.__split("explain_batch", X, class_names, top=top, approximate=approximate)
+
+    def __split(self, method: str, X, class_names: bool, **options) -> tuple:
+        """
+        Routes every record, calls every model once with its records
+        and merges the results in the order of X
+        """
+        n = len(X) if isinstance(X, list) else X.shape[0]
+        routed = [self.route() for _ in range(n)]
+        if all(slot is self.primary for slot in routed):
+            return self.__call(self.primary, method, X, class_names, **options)
+
+        parts = []
+        for slot in self.slots:
+            rows = [i for i, routed_slot in enumerate(routed) if routed_slot is slot]
+            if rows:
+                subset = [X[i] for i in rows] if isinstance(X, list) else X[rows]
+                parts.append((rows, self.__call(slot, method, subset, class_names, **options)))
+        merged = [
+            _merge(n, [(rows, result[i]) for rows, result in parts])
+            for i in range(len(parts[0][1]))
+        ]
+        return Routed(merged, _merge(n, [(rows, result.models) for rows, result in parts]))
+
+    def __call(self, slot: _Slot, method: str, X, class_names: bool, **options) -> Routed:
+        model, version = slot.serving
+        if not REGISTRY.enabled:
+            return self.__routed(slot, version, getattr(model, method)(X, class_names, **options))
+
+        start = time.perf_counter()
+        result = getattr(model, method)(X, class_names, **options)
+        y = result[0]
+        labels = {"model": slot.label}
+        REGISTRY.observe("model_seconds", time.perf_counter() - start, labels)
+
+        outcomes = Counter(np.atleast_1d(y).tolist())
+        for outcome, count in outcomes.items():
+            if not class_names:
+                outcome = model.encoder.outcome_mapping[outcome]
+            REGISTRY.inc("model_outcomes_total", count, dict(labels, outcome=outcome))
+        return self.__routed(slot, version, result)
+
+    @staticmethod
+    def __routed(slot: _Slot, version: tuple, result: tuple) -> Routed:
+        return Routed(result, [_served(slot.label, version)] * len(result[0]))
+
+    def stats(self) -> dict:
+        return {
+            slot.name: {
+                "path": slot.path,
+                "loaded_at": slot.loaded_at,
+                "reloads": slot.reloads,
+                "failures": slot.failures,
+            }
+            for slot in self.slots
+        }
+
+    def gauges(self) -> dict:
+        """
+        Stats for monitoring.metrics.Registry.register_collector,
+        including the prediction caches of the current models
+        """
+        gauges = {"model_candidate_share": self.candidate_share}
+        for slot in self.slots:
+            gauges[f"model_{slot.name}_loaded_timestamp"] = slot.loaded_at
+            gauges[f"model_{slot.name}_reloads"] = slot.reloads
+            gauges[f"model_{slot.name}_reload_failures"] = slot.failures
+            cache = slot.model.cache
+            if cache is not None:
+                prefix = "" if slot is self.primary else f"{slot.name}_"
+                gauges.update(
+                    {f"{prefix}{name}": value for name, value in cache.gauges().items()}
+                )
+        return gauges
+
+
+def _served(label: str, version: tuple) -> str:
+    """
+    returns: name of the model version in the audit log and the metrics,
+             e.g. "xgb.pickle@1700000000000000000"
+    """
+    return f"{label}@{version[0]}"
+
+
+def _merge(n: int, parts: list):
+    """
+    Merges results for subsets of records into one result of the same type,
+    so the merged result looks like the one of a single Model call
+
+    input: n - number of records
+           parts - list of (numbers of the records, results for them),
+                   lists (classes of Model.predict, contributors of Model.explain)
+                   are merged into a list, arrays - into an array
+    """
+    if isinstance(parts[0][1], list):
+        merged = [None] * n
+        for rows, value in parts:
+            for row, item in zip(rows, value):
+                merged[row] = item
+        return merged
+
+    values = [np.asarray(value) for _, value in parts]
+    merged = np.empty((n,) + values[0].shape[1:], dtype=np.result_type(*values))
+    for (rows, _), value in zip(parts, values):
+        merged[rows] = value
+    return merged
@@ -0,0 +1,330 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import logging
+import os
+import threading
+from typing import Callable
+
+from models.encoder import Encoder
+
+
+logger = logging.getLogger(__name__)
+
+# species served when a request doesn't name one, its schema is built into Encoder
+HORSE = "horse"
+
+
+class Species:
+    """
+    Declaration of a species: the feature schema and the model artefact
+
+    Declaring a species loads nothing, the schema is read when the encoder
+    is built (encoder) and the model is loaded by SpeciesRegistry on the first request.
+    """
+
+    def __init__(
+        self, name: str, title: str, model_path: str, schema_path: str = None
+    ) -> None:
+        """
+        input: name - key of the species in the bot commands, e.g. horse
+               title - name of the species shown to the users
+               model_path - file of the model, see models.loader
+               schema_path - json file with encode_order, default_values
+                             and outcome_mapping (see Encoder), None - the horse schema
+        """
+        self.name = name
+        self.title = title
+        self.model_path = model_path
+        self.schema_path = schema_path
+
+    def encoder(self, warn: bool = False) -> Encoder:
+        """
+        returns: new Encoder with the schema of the species
+        """
+        schema = load_schema(self.schema_path) if self.schema_path else None
+        return Encoder(warn, schema)
+
+    def size(self) -> int:
+        """
+        Estimate of the memory taken by the loaded model - the size of the model file
+
+        returns: bytes, 0 if the file doesn't exist (yet)
+        """
+        try:
+            return os.path.getsize(self.model_path)
+        except OSError:
+            return 0
+
+    def __repr__(self) -> str:
+        return f"Species({self.name!r}, {self.model_path!r})"
+
+
+def load_schema(path: str) -> dict:
+    """
+    Reads the feature schema of a species
+
+    input: path - json file {"encode_order": ..., "default_values": ..., "outcome_mapping": ...},
+                  in the format of the same attributes of Encoder
+    returns: dict for Encoder(schema=...)
+    """
+    with open(path, encoding="utf-8") as f:
+        schema = json.load(f)
+    # json keys are strings, the model predicts numbers of the classes
+    schema["outcome_mapping"] = {
+        int(key): outcome for key, outcome in schema["outcome_mapping"].items()
+    }
+    return schema
+
+
+def load_species(path: str, root: str = "") -> dict:
+    """
+    Reads declarations of the species from a json file, e.g.
+        {"dog": {"title": "собака", "model": "saved_models/dog.pickle",
+                 "schema": "schemas/dog.json"}}
+    without "schema" the horse schema is used
+
+    input: path - json file
+           root - directory the relative paths of the models and schemas are relative to
+    returns: dict {name: Species}
+    """
+    with open(path, encoding="utf-8") as f:
+        declarations = json.load(f)
+
+    species = {}
+    for name, declaration in declarations.items():
+        schema_path = declaration.get("schema")
+        species[name] = Species(
+            name,
+            declaration.get("title", name),
+            os.path.join(root, declaration["model"]),
+            os.path.join(root, schema_path) if schema_path else None,
+        )
+    return species
+
+
+class _Entry:
+    """
+    Loaded object of a species and the requests using it
+    """
+
+    __slots__ = ("value", "size", "users", "evicted")
+
+    def __init__(self, value, size: int) -> None:
+        self.value = value
+        self.size = size
+        self.users = 0
+        self.evicted = False
+
+
+class SpeciesRegistry:
+    """
+    Objects of the species (models with their encoders) loaded lazily under a memory budget
+
+    The object of a species is created by load(species) on the first request
+    for that species, so the start-up time and the memory don't grow with
+    the number of declared species. Loaded objects are kept in LRU order;
+    when their total size (Species.size) exceeds budget, the least recently
+    used ones are evicted and passed to unload. An object that is in use
+    (see use) is unloaded only when its last request finishes.
+    Concurrent requests for a species that is not loaded wait for one load,
+    loading of a species doesn't block requests for the other ones.
+    """
+
+    def __init__(
+        self,
+        species: dict,
+        load: Callable,
+        unload: Callable = None,
+        default: str = HORSE,
+        budget: int = 0,
+        gauges: Callable = None,
+    ) -> None:
+        """
+        input: species - dict {name: Species}
+               load - creates the object of a species from Species, e.g. a model
+               unload - releases an evicted object, e.g. stops its threads
+               default - species of the requests that don't name one
+               budget - maximum total size of the loaded objects, bytes, 0 - no limit;
+                        the most recently used object is kept even if it alone exceeds it
+               gauges - stats of a loaded object for register_collector, see gauges
+        """
+        if default not in species:
+            raise ValueError(f"Unknown default species: {default}")
+
+        self.species = species
+        self.load = load
+        self.unload = unload
+        self.default = default
+        self.budget = budget
+        self.value_gauges = gauges
+
+        # name -> _Entry, the least recently used go first
+        self._loaded = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.loads = 0
+        self.failures = 0
+        self.evictions = 0
+
+    def resolve(self, name: str = None) -> str:
+        """
+        returns: name of the declared species, the default one if name is None or empty
+        """
+        name = name or self.default
+        if name not in self.species:
+            raise KeyError(f"Unknown species: {name}")
+        return name
+
+    def get(self, name: str = None):
+        """
+        returns: loaded object of the species; it can be evicted at any moment,
+                 so requests that need it to stay usable should use use()
+        """
+        entry = self.__acquire(self.resolve(name))
+        self.__release(entry)
+        return entry.value
+
+    @contextmanager
+    def use(self, name: str = None):
+        """
+        Context manager with the loaded object of the species,
+        the object isn't unloaded until the block exits
+        """
+        entry = self.__acquire(self.resolve(name))
+        try:
+            yield entry.value
+        finally:
+            self.__release(entry)
+
+    def peek(self, name: str = None):
+        """
+        returns: loaded object of the species, None if it isn't loaded;
+                 doesn't load it and doesn't change the LRU order
+        """
+        with self._lock:
+            entry = self._loaded.get(self.resolve(name))
+        return entry.value if entry is not None else None
+
+    def loaded(self) -> list:
+        """
+        returns: names of the loaded species, the least recently used first
+        """
+        with self._lock:
+            return list(self._loaded)
+
+    def __acquire(self, name: str) -> _Entry:
+        with self._lock:
+            entry = self.__take(name)
+            if entry is not None:
+                return entry
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        with loading:
+            # the species could be loaded by another request while this one waited
+            with self._lock:
+                entry = self.__take(name)
+                if entry is not None:
+                    return entry
+
+            species = self.species[name]
+            try:
+                entry = _Entry(self.load(species), species.size())
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                raise
+            logger.info("Species %s loaded: %s bytes", name, entry.size)
+
+            with self._lock:
+                entry.users += 1
+                self._loaded[name] = entry
+                self.bytes += entry.size
+                self.loads += 1
+                evicted = self.__evict(name)
+
+        for evicted_entry in evicted:
+            self.__unload(evicted_entry)
+        return entry
+
+    def __take(self, name: str) -> _Entry:
+        """
+        Loaded entry of the species marked as used, None if it isn't loaded; under self._lock
+        """
+        entry = self._loaded.get(name)
+        if entry is not None:
+            self._loaded.move_to_end(name)
+            entry.users += 1
+            self.hits += 1
+        return entry
+
+    def __evict(self, keep: str) -> list:
+        """
+        Evicts the least recently used species until the loaded ones fit the budget;
+        under self._lock
+
+        returns: evicted entries that are not in use and must be unloaded now
+        """
+        unused = []
+        while self.budget and self.bytes > self.budget:
+            name = next((name for name in self._loaded if name != keep), None)
+            if name is None:
+                break
+            entry = self._loaded.pop(name)
+            entry.evicted = True
+            self.bytes -= entry.size
+            self.evictions += 1
+            logger.info("Species %s evicted", name)
+            if entry.users == 0:
+                unused.append(entry)
+        return unused
+
+    def __release(self, entry: _Entry) -> None:
+        with self._lock:
+            entry.users -= 1
+            unload = entry.evicted and entry.users == 0
+        if unload:
+            self.__unload(entry)
+
+    def __unload(self, entry: _Entry) -> None:
+        if self.unload is None:
+            return
+        try:
+            self.unload(entry.value)
+        except Exception:
+            logger.exception("Can't unload an evicted species")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "declared": len(self.species),
+                "loaded": len(self._loaded),
+                "bytes": self.bytes,
+                "budget_bytes": self.budget,
+                "hits": self.hits,
+                "loads": self.loads,
+                "load_failures": self.failures,
+                "evictions": self.evictions,
+            }
+
+    def gauges(self) -> dict:
+        """
+        Stats for monitoring.metrics.Registry.register_collector
+        and the stats of every loaded object (the gauges function),
+        prefixed with the name of the species except the default one
+        """
+        gauges = {f"species_{name}": value for name, value in self.stats().items()}
+        if self.value_gauges is None:
+            return gauges
+
+        with self._lock:
+            loaded = list(self._loaded.items())
+        for name, entry in loaded:
+            prefix = "" if name == self.default else f"{name}_"
+            gauges.update(
+                {f"{prefix}{key}": value for key, value in self.value_gauges(entry.value).items()}
+            )
+        return gauges
@@ -0,0 +1,140 @@
+import json
+
+import numpy as np
+
+
+class CompiledTrees:
+    """
+    Tree ensemble of xgboost.Booster compiled into flat numpy arrays
+
+    Evaluates single records and small batches with vectorized traversal
+    of all trees at once, without DMatrix construction and predictor setup.
+    Has the same predict/predict_proba interface as XGBClassifier,
+    so it can be used as the model of Model.
+
+    Supports gbtree models with numeric splits and
+    multi:softmax, multi:softprob or binary:logistic objectives.
+    """
+
+    def __init__(self, booster) -> None:
+        """
+        input: booster - xgboost.Booster, XGBClassifier or anything with get_booster()
+        """
+        if hasattr(booster, "get_booster"):
+            booster = booster.get_booster()
+
+        dump = json.loads(booster.save_raw("json"))
+        learner = dump["learner"]
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("Only gbtree models can be compiled")
+
+        self.objective = learner["objective"]["name"]
+        params = learner["learner_model_param"]
+        self.num_class = max(int(params["num_class"]), 1)
+        self.num_feature = int(params["num_feature"])
+        # base_score is "0.5" or "[5E-1,5E-1,5E-1]", one value per class
+        base_score = np.array(json.loads(params["base_score"]), dtype=np.float32)
+        self.base_margin = self.__base_margin(np.broadcast_to(base_score, self.num_class))
+
+        model = learner["gradient_booster"]["model"]
+        self.__compile(model["trees"], model["tree_info"])
+
+    def __base_margin(self, base_score: np.array) -> np.array:
+        """
+        base_score is stored in the probability space for binary:logistic
+        and in the margin space for the multiclass objectives
+        """
+        if self.objective == "binary:logistic":
+            return np.log(base_score / (1 - base_score)).astype(np.float32)
+        return base_score.astype(np.float32)
+
+    def __compile(self, trees: list, tree_info: list) -> None:
+        """
+        Concatenates nodes of every tree into flat arrays
+
+        Children of a leaf point to the leaf itself, so traversal
+        can make the same number of steps for every tree.
+        Leaf values are stored in self.threshold of the leaf nodes.
+        """
+        feature, threshold, left, right, default_left = [], [], [], [], []
+        roots = []
+        offset = 0
+        depth = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+
+            n = len(tree["left_children"])
+            lefts = np.array(tree["left_children"], dtype=np.int64)
+            rights = np.array(tree["right_children"], dtype=np.int64)
+            nodes = np.arange(n)
+            leaf = lefts == -1
+
+            roots.append(offset)
+            feature.append(np.array(tree["split_indices"], dtype=np.int64))
+            threshold.append(np.array(tree["split_conditions"], dtype=np.float32))
+            left.append(np.where(leaf, nodes, lefts) + offset)
+            right.append(np.where(leaf, nodes, rights) + offset)
+            default_left.append(np.array(tree["default_left"], dtype=bool))
+
+            depth = max(depth, self.__depth(lefts, rights))
+            offset += n
+
+        self.feature = np.concatenate(feature)
+        self.threshold = np.concatenate(threshold)
+        self.left = np.concatenate(left)
+        # right child = left child + step, the step of a leaf is 0
+        self.step = np.concatenate(right) - self.left
+        self.default_left = np.concatenate(default_left)
+        self.roots = np.array(roots, dtype=np.int64)
+        self.depth = depth
+        # (number of trees, number of classes) matrix, sums leaf values by class
+        self.tree_class = np.zeros((len(trees), self.num_class), dtype=np.float32)
+        self.tree_class[np.arange(len(trees)), np.array(tree_info, dtype=np.int64)] = 1
+
+    @staticmethod
+    def __depth(lefts: np.array, rights: np.array) -> int:
+        depth = 0
+        level = [0]
+        while True:
+            level = [c for node in level for c in (lefts[node], rights[node]) if c != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def predict_margin(self, X: np.array) -> np.array:
+        """
+        returns: raw margin with shape (n, number of classes)
+        """
+        X = np.asarray(X, dtype=np.float32).reshape((-1, self.num_feature))
+        rows = np.arange(len(X))[:, None]
+
+        # current node of every tree for every record
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            values = X[rows, self.feature[nodes]]
+            # NaN < threshold is False, missing values go by default_left
+            go_right = values >= self.threshold[nodes]
+            missing = np.isnan(values)
+            if missing.any():
+                go_right[missing] = ~self.default_left[nodes[missing]]
+            nodes = self.left[nodes] + self.step[nodes] * go_right
+
+        return self.threshold[nodes] @ self.tree_class + self.base_margin
+
+    def predict_proba(self, X: np.array) -> np.array:
+        """
+        returns: probabilities of every class with shape (n, number of classes)
+        """
+        margin = self.predict_margin(X)
+        if self.objective.startswith("multi:"):
+            exp = np.exp(margin - margin.max(axis=1, keepdims=True))
+            return exp / exp.sum(axis=1, keepdims=True)
+        if self.objective == "binary:logistic":
+            p = 1 / (1 + np.exp(-margin[:, 0]))
+            return np.vstack((1 - p, p)).T
+
+        raise ValueError(f"Objective {self.objective} is not supported")
+
+    def predict(self, X: np.array) -> np.array:
+        return self.predict_proba(X).argmax(axis=1)
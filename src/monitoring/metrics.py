@@ -0,0 +1,198 @@
+"""Метрики приложения: счетчики, гистограммы и замер времени этапов.
+
+Метрики хранятся в памяти процесса и отдаются в текстовом формате Prometheus
+(см. monitoring/server.py). Сбор метрик можно отключить (REGISTRY.enabled = False),
+тогда span() и inc() сводятся к проверке одного флага.
+
+Пример:
+    with span("parse"):
+        data = parse_input(features, message)
+    inc("parse_errors_total")
+"""
+from bisect import bisect_left
+import contextlib
+import threading
+import time
+from typing import Callable
+
+
+PREFIX = "zoohelper_"
+# границы корзин гистограмм задержки, секунды
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1, 2.5, 5, 10,
+)
+
+_NOOP = contextlib.nullcontext()
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        # counts[i] -- число значений в корзине (buckets[i-1], buckets[i]], последняя -- +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> tuple:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Span:
+    """Замер времени блока кода в гистограмму."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Registry:
+    """Хранилище метрик процесса."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        # функции, возвращающие значения метрик-показателей (gauge) на момент выгрузки
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, labels: dict = None, help: str = "") -> Counter:
+        key = (name, _labels_key(labels))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+                self._help.setdefault(name, help)
+        return counter
+
+    def histogram(
+        self, name: str, labels: dict = None, help: str = "", buckets: tuple = LATENCY_BUCKETS
+    ) -> Histogram:
+        key = (name, _labels_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+                self._help.setdefault(name, help)
+        return histogram
+
+    def inc(self, name: str, amount: float = 1, labels: dict = None) -> None:
+        """Увеличение счетчика, если сбор метрик включен."""
+        if self.enabled:
+            self.counter(name, labels).inc(amount)
+
+    def observe(self, name: str, value: float, labels: dict = None) -> None:
+        """Значение в гистограмму, если сбор метрик включен."""
+        if self.enabled:
+            self.histogram(name, labels).observe(value)
+
+    def span(self, stage: str, labels: dict = None):
+        """Замер времени этапа в гистограмму stage_seconds{stage=...}."""
+        if not self.enabled:
+            return _NOOP
+        labels = dict(labels or {}, stage=stage)
+        return _Span(self.histogram("stage_seconds", labels, "Duration of pipeline stages"))
+
+    def register_collector(self, collector: Callable[[], dict]) -> None:
+        """Добавление источника показателей;
+
+        Args:
+            collector (Callable[[], dict]): возвращает {имя показателя: значение}.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            collectors = list(self._collectors)
+
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            if self._help.get(name):
+                lines.append(f"# HELP {PREFIX}{name} {self._help[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), counter in counters:
+            describe(name, "counter")
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {counter.value}")
+
+        for (name, labels), histogram in histograms:
+            describe(name, "histogram")
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = _format_labels(labels, (("le", bound),))
+                lines.append(f"{PREFIX}{name}_bucket{le} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {count}")
+
+        for collector in collectors:
+            for name, value in sorted(collector().items()):
+                describe(name, "gauge")
+                lines.append(f"{PREFIX}{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# метрики процесса по умолчанию
+REGISTRY = Registry()
+
+
+def span(stage: str, labels: dict = None):
+    return REGISTRY.span(stage, labels)
+
+
+def inc(name: str, amount: float = 1, labels: dict = None) -> None:
+    REGISTRY.inc(name, amount, labels)
@@ -0,0 +1,66 @@
+"""Выгрузка метрик: HTTP-эндпоинт /metrics в формате Prometheus и периодическая запись в файл."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+
+from monitoring.metrics import REGISTRY, Registry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_http_server(address: str, registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Запуск эндпоинта /metrics в фоновом потоке;
+
+    Args:
+        address (str): адрес, host:port;
+        registry (Registry): метрики;
+
+    Returns:
+        ThreadingHTTPServer: сервер, server.shutdown() -- остановка.
+    """
+    host, port = address.rsplit(":", 1)
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, int(port)), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_file_dump(path: str, interval: float, registry: Registry = REGISTRY) -> threading.Event:
+    """Периодическая запись метрик в файл (атомарно, через временный файл);
+
+    Args:
+        path (str): путь к файлу;
+        interval (float): период записи, секунды;
+        registry (Registry): метрики;
+
+    Returns:
+        threading.Event: stop.set() -- остановка записи.
+    """
+    stop = threading.Event()
+
+    def dump() -> None:
+        while not stop.wait(interval):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(registry.render())
+            os.replace(tmp_path, path)
+
+    threading.Thread(target=dump, name="metrics-dump", daemon=True).start()
+    return stop
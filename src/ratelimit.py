@@ -0,0 +1,69 @@
+"""Ограничение частоты запросов к инференсу от одного чата.
+
+У каждого чата своё "ведро" на burst запросов, которое пополняется со
+скоростью rate запросов в секунду. Запрос без свободного места в ведре
+сразу отклоняется, поэтому один чат не может занять весь инференс.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """Token bucket на каждый chat_id."""
+
+    def __init__(self, rate: float, burst: int, maxsize: int = 100000):
+        """
+        Args:
+            rate (float): запросов в секунду в среднем;
+            burst (int): запросов подряд без ожидания;
+            maxsize (int): максимальное число отслеживаемых чатов, давно не писавшие
+                           вытесняются (их ведро всё равно успело бы наполниться).
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        # chat_id -> (число запросов в ведре, время последнего пополнения)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.throttled = 0
+
+    def acquire(self, chat_id: int) -> float:
+        """Попытка занять место в ведре чата;
+
+        Returns:
+            float: 0, если запрос разрешен, иначе -- сколько секунд подождать.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(chat_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.throttled += 1
+
+            self._buckets[chat_id] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "chats": len(self._buckets),
+                "allowed": self.allowed,
+                "throttled": self.throttled,
+            }
+
+    def gauges(self) -> dict:
+        """Показатели для monitoring.metrics.Registry.register_collector."""
+        return {f"rate_limit_{name}": value for name, value in self.stats().items()}
@@ -0,0 +1,67 @@
+"""Повтор записанных в журнал рекомендаций через модель (проверка на регрессии).
+
+Пример, из корневой директории репозитория:
+    python ./src/replay.py audit/ --model saved_models/xgb.pickle
+    python ./src/replay.py audit/ --species dog
+    python ./src/replay.py audit/ --model saved_models/new.pickle --served-by xgb.pickle
+"""
+import argparse
+import itertools
+import os
+import warnings
+
+from inference.audit import model_file, read_audit, replay
+from models.model import Model
+import settings
+from worker import declared_species
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay of the audit log through the model")
+    parser.add_argument("audit", help="audit file or directory, e.g. audit/")
+    parser.add_argument(
+        "--species", default=settings.DEFAULT_SPECIES, help="replay the records of the species"
+    )
+    parser.add_argument("--model", help="model of the species, default - the declared one")
+    parser.add_argument(
+        "--served-by",
+        help="replay the records of this model file, e.g. xgb.pickle, "
+        "default - the file of the declared model (not of the A/B candidate)",
+    )
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--show", type=int, default=10, help="number of the changes to print")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    species = declared_species()[args.species]
+    model = Model.load(args.model or species.model_path, encoder=species.encoder())
+
+    # рекомендации других моделей (например, кандидата A/B-сравнения) изменились бы
+    # из-за другой модели, а не из-за регрессии
+    served_by = args.served_by or os.path.basename(species.model_path)
+    # записи до появления видов животных -- вида по умолчанию
+    records = (
+        record
+        for record in read_audit(args.audit)
+        if (record.get("species") or settings.DEFAULT_SPECIES) == args.species
+        and model_file(record) == served_by
+    )
+    total = 0
+    changed = []
+    while batch := list(itertools.islice(records, args.batch_size)):
+        total += len(batch)
+        changed.extend(replay(batch, model, args.tolerance))
+
+    print(f"Replayed {total} records, {len(changed)} changed")
+    for record, outcome, probability in changed[:args.show]:
+        print(
+            f"  {record['outcome']} {record['probability']:.4f} ({record['model']})"
+            f" -> {outcome} {probability:.4f}: {record['features']}"
+        )
+    if changed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
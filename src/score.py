@@ -0,0 +1,48 @@
+"""Пакетная оценка csv-файла с записями клиник.
+
+Пример, из корневой директории репозитория:
+    python ./src/score.py data/test.csv predictions.csv --workers 4
+"""
+import argparse
+import time
+
+from inference.bulk import score_csv
+import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk scoring of a csv file")
+    parser.add_argument("input", help="csv file with records, e.g. data/test.csv")
+    parser.add_argument("output", help="csv file for the predictions")
+    parser.add_argument("--model", default=settings.MODEL_PATH)
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--explain",
+        type=int,
+        default=0,
+        help="number of the features with the largest contributions to add to every prediction",
+    )
+    parser.add_argument(
+        "--approximate", action="store_true", help="approximate contributions, much faster"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scored, diagnostics = score_csv(
+        args.input,
+        args.output,
+        args.model,
+        args.chunksize,
+        args.workers,
+        explain=args.explain,
+        approximate=args.approximate,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Scored {scored} records in {elapsed:.1f} s ({scored / elapsed:.0f} records/s)")
+    for feature, issues in diagnostics.to_dict().items():
+        print(f"  {feature}: " + ", ".join(f"{name} {count}" for name, count in issues.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""HTTP/JSON API инференса для интеграции клиник (inference/api.py), рядом с ботом.
+
+Запуск из корневой директории репозитория:
+    python ./src/server.py --address 127.0.0.1:8080 --workers 4
+Запросы:
+    curl -X POST http://127.0.0.1:8080/predict -d '{"surgery": "yes", "pulse": 132}'
+    curl -X POST 'http://127.0.0.1:8080/predict_batch?explain=3' \\
+        -d '[{"pulse": 132}, {"text": "surgery: yes, age: young"}]'
+
+Процессы-обработчики (--workers, по умолчанию по числу ядер) слушают один порт
+(SO_REUSEPORT), соединения распределяются между ними ядром ОС; модели каждый
+процесс загружает сам. Соединения keep-alive живут SERVER_KEEPALIVE секунд простоя.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import signal
+import sys
+
+from aiohttp import web
+
+from inference.api import InferenceAPI
+from monitoring.metrics import REGISTRY
+import settings
+from worker import create_audit_log, create_species_registry, setup_monitoring
+
+
+def serve(
+    address: str, model_path: str, threads: int, reuse_port: bool, export_metrics: bool
+) -> None:
+    """Работа сервера в текущем процессе до SIGINT/SIGTERM;
+
+    Args:
+        address (str): адрес, host:port;
+        model_path (str): модель лошади, модели остальных видов -- из settings;
+        threads (int): число потоков для /predict_batch и загрузки моделей;
+        reuse_port (bool): порт общий с другими процессами-обработчиками;
+        export_metrics (bool): выгружать метрики (METRICS_ADDRESS, METRICS_DUMP_PATH);
+                               у нескольких процессов был бы один адрес эндпоинта.
+    """
+    if export_metrics:
+        setup_monitoring()
+    else:
+        REGISTRY.enabled = settings.METRICS_ENABLED
+
+    api = InferenceAPI(
+        create_species_registry(model_path),
+        ThreadPoolExecutor(threads, thread_name_prefix="http"),
+        settings.SERVER_MAX_PENDING,
+        settings.SERVER_MAX_BATCH_SIZE,
+        create_audit_log(),
+    )
+    REGISTRY.register_collector(api.gauges)
+
+    host, port = address.rsplit(":", 1)
+    web.run_app(
+        api.app(settings.SERVER_MAX_BODY),
+        host=host,
+        port=int(port),
+        reuse_port=reuse_port,
+        keepalive_timeout=settings.SERVER_KEEPALIVE,
+        access_log=None,
+        print=None,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON inference API")
+    parser.add_argument("--address", default=settings.SERVER_ADDRESS)
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="model of the horse")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--threads", type=int, default=settings.SERVER_THREADS)
+    args = parser.parse_args()
+
+    print(f"HTTP API started on {args.address}, {args.workers} worker(s)")
+    if args.workers <= 1:
+        serve(args.address, args.model, args.threads, False, True)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=serve,
+            args=(args.address, args.model, args.threads, True, False),
+            name=f"http-worker-{i}",
+        )
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # по SIGTERM процессы-обработчики тоже останавливаются, а не остаются без родителя
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == "__main__":
+    main()
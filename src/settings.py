@@ -0,0 +1,106 @@
+"""Параметры приложения, подгружаются из .env-файла."""
+import os
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# корневая директория репозитория, относительно неё задаются пути
+ROOT_DIR = os.path.split(os.path.dirname(os.path.abspath(__file__)))[0]
+
+BOT_TOKEN = os.environ.get("BOT_TOKEN")
+MODEL_PATH = os.path.join(ROOT_DIR, os.environ.get("MODEL_PATH", ""))
+# модель в формате xgboost (.ubj/.json) загружается при первом запросе
+MODEL_LAZY_LOAD = os.environ.get("MODEL_LAZY_LOAD", "1") == "1"
+# xgboost -- предсказание средствами xgboost;
+# compiled -- деревья модели компилируются в массивы numpy (быстрее для одиночных запросов)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "xgboost")
+# вторая модель для A/B-сравнения (пусто -- без неё) и процент записей, которые она получает
+MODEL_CANDIDATE_PATH = os.environ.get("MODEL_CANDIDATE_PATH", "")
+if MODEL_CANDIDATE_PATH:
+    MODEL_CANDIDATE_PATH = os.path.join(ROOT_DIR, MODEL_CANDIDATE_PATH)
+MODEL_CANDIDATE_PERCENT = float(os.environ.get("MODEL_CANDIDATE_PERCENT", 0))
+# период проверки файлов моделей, секунды; изменившийся файл загружается заново (0 -- не проверять)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+
+# виды животных (models.species): json-файл с объявлениями видов помимо лошади
+# (пусто -- только лошадь с MODEL_PATH), вид по умолчанию для чатов, не выбравших вид,
+# и ограничение памяти загруженных моделей, байты (0 -- без ограничения),
+# сверх него вытесняются давно не использованные; сколько секунд помнить вид, выбранный чатом
+SPECIES_PATH = os.environ.get("SPECIES_PATH", "")
+if SPECIES_PATH:
+    SPECIES_PATH = os.path.join(ROOT_DIR, SPECIES_PATH)
+DEFAULT_SPECIES = os.environ.get("DEFAULT_SPECIES", "horse")
+SPECIES_MEMORY_BUDGET = int(os.environ.get("SPECIES_MEMORY_BUDGET", 0))
+SPECIES_TTL = float(os.environ.get("SPECIES_TTL", 30 * 24 * 3600))
+
+# число параметров с наибольшим вкладом в предсказание, перечисляемых в ответе (0 -- не перечислять);
+# точный вклад (SHAP) xgb.pickle стоит ~15 мс на запись, EXPLAIN_APPROXIMATE=1 -- в десятки раз дешевле
+EXPLAIN_TOP = int(os.environ.get("EXPLAIN_TOP", 0))
+EXPLAIN_APPROXIMATE = os.environ.get("EXPLAIN_APPROXIMATE", "0") == "1"
+
+# параметры микро-батчинга запросов к модели
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", 5))
+# число потоков, одновременно ожидающих ответа инференса
+BOT_NUM_THREADS = int(os.environ.get("BOT_NUM_THREADS", 8))
+# максимальное число сообщений в работе и в очереди к инференсу,
+# остальным сразу отвечаем, что бот перегружен
+BOT_MAX_PENDING = int(os.environ.get("BOT_MAX_PENDING", 64))
+# ограничение частоты запросов к инференсу от одного чата: в среднем
+# RATE_LIMIT_PER_MINUTE запросов в минуту (0 -- без ограничения), не больше RATE_LIMIT_BURST подряд
+RATE_LIMIT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_PER_MINUTE", 20))
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", 5))
+# хранилище состояний диалогов: memory -- в памяти процесса, sqlite -- в файле STATE_PATH
+# (общий для нескольких процессов бота); число состояний и время их жизни, секунды
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+STATE_PATH = os.path.join(ROOT_DIR, os.environ.get("STATE_PATH", "bot_state.sqlite3"))
+STATE_MAX_SIZE = int(os.environ.get("STATE_MAX_SIZE", 100000))
+STATE_TTL = float(os.environ.get("STATE_TTL", 900))
+# адрес Telegram Bot API, например локального тестового сервера (пусто -- api.telegram.org)
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "")
+
+# где выполняется инференс:
+#   inline -- в процессе бота;
+#   local -- в INFERENCE_WORKERS дочерних процессах, связь через multiprocessing очереди;
+#   socket -- в отдельном сервисе (src/worker.py) по адресу INFERENCE_ADDRESS.
+INFERENCE_TRANSPORT = os.environ.get("INFERENCE_TRANSPORT", "inline")
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1))
+INFERENCE_ADDRESS = os.environ.get("INFERENCE_ADDRESS", "127.0.0.1:8765")
+# время ожидания ответа сервиса инференса, секунды
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", 30))
+
+# HTTP/JSON API (src/server.py): адрес, число процессов-обработчиков и потоков в каждом,
+# максимальное число записей в работе в процессе (сверх него -- ответ 503) и в одном
+# запросе /predict_batch, максимальный размер тела запроса, байты, и время жизни
+# простаивающего keep-alive соединения, секунды
+SERVER_ADDRESS = os.environ.get("SERVER_ADDRESS", "127.0.0.1:8080")
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", os.cpu_count() or 1))
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 4))
+SERVER_MAX_PENDING = int(os.environ.get("SERVER_MAX_PENDING", 20000))
+SERVER_MAX_BATCH_SIZE = int(os.environ.get("SERVER_MAX_BATCH_SIZE", 10000))
+SERVER_MAX_BODY = int(os.environ.get("SERVER_MAX_BODY", 16 * 2**20))
+SERVER_KEEPALIVE = float(os.environ.get("SERVER_KEEPALIVE", 75))
+
+# кэш предсказаний: число записей (0 -- без кэша) и время жизни записи, секунды
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 3600))
+
+# журнал рекомендаций (inference/audit.py): директория (пусто -- не вести), размер файла, байты,
+# и время, секунды, после которых начинается новый файл, период сброса на диск, секунды,
+# максимальное число записей, ожидающих записи
+AUDIT_DIR = os.environ.get("AUDIT_DIR", "")
+if AUDIT_DIR:
+    AUDIT_DIR = os.path.join(ROOT_DIR, AUDIT_DIR)
+AUDIT_MAX_BYTES = int(os.environ.get("AUDIT_MAX_BYTES", 64 * 2**20))
+AUDIT_MAX_AGE = float(os.environ.get("AUDIT_MAX_AGE", 3600))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 1))
+AUDIT_MAX_PENDING = int(os.environ.get("AUDIT_MAX_PENDING", 10000))
+
+# метрики: сбор (1/0), адрес эндпоинта /metrics (пусто -- без эндпоинта),
+# файл для периодической записи метрик (пусто -- без записи) и период записи, секунды
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_ADDRESS = os.environ.get("METRICS_ADDRESS", "")
+METRICS_DUMP_PATH = os.environ.get("METRICS_DUMP_PATH", "")
+METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", 60))
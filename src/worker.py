@@ -0,0 +1,251 @@
+"""Сервис инференса, отдельный от бота.
+
+Загружает модель каждого вида животного при первом запросе о нём (models.species)
+и отвечает на сообщения, пришедшие через транспорт (см. inference/transport.py).
+Запуск TCP-сервиса:
+    python ./src/worker.py --address 127.0.0.1:8765
+"""
+import argparse
+import atexit
+import multiprocessing
+from typing import Callable
+
+from inference.audit import AuditLog
+from inference.batching import BatchScheduler
+from inference.model_inference import process
+from inference.transport import QueueClient, SocketServer, serve_queue
+from models.cache import PredictionCache
+from models.encoder import Encoder
+from models.model import Model
+from models.registry import ModelRegistry
+from models.species import HORSE, Species, SpeciesRegistry, load_species
+from monitoring.metrics import REGISTRY
+from monitoring.server import start_file_dump, start_http_server
+import settings
+
+
+def setup_monitoring() -> None:
+    """Включение сбора метрик и их выгрузки согласно settings."""
+    REGISTRY.enabled = settings.METRICS_ENABLED
+    if not settings.METRICS_ENABLED:
+        return
+    if settings.METRICS_ADDRESS:
+        start_http_server(settings.METRICS_ADDRESS)
+    if settings.METRICS_DUMP_PATH:
+        start_file_dump(settings.METRICS_DUMP_PATH, settings.METRICS_DUMP_INTERVAL)
+
+
+def load_model(model_path: str, encoder: Encoder = None) -> Model:
+    """Загрузка модели с кэшем предсказаний согласно settings;
+
+    Args:
+        model_path (str): путь к модели;
+        encoder (Encoder): кодировщик схемы вида животного, None -- лошадь;
+
+    Returns:
+        Model: модель.
+    """
+    cache = None
+    if settings.PREDICTION_CACHE_SIZE > 0:
+        cache = PredictionCache(
+            settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL
+        )
+    return Model.load(
+        model_path, cache, settings.MODEL_LAZY_LOAD, settings.MODEL_BACKEND, encoder
+    )
+
+
+def create_model(
+    model_path: str, species: Species = None, candidate: bool = True
+) -> ModelRegistry:
+    """Модель, перезагружаемая при изменении файла, с A/B-маршрутизацией согласно settings;
+
+    У каждой загруженной версии модели свой кодировщик, поэтому построенные
+    для кодировщика парсер и ответы бота (parser_for, responses_for) строятся заново.
+
+    Args:
+        model_path (str): путь к основной модели;
+        species (Species): вид животного, схема кодировщика; None -- лошадь;
+        candidate (bool): сравнивать ли с MODEL_CANDIDATE_PATH (модель того же вида);
+
+    Returns:
+        ModelRegistry: заменяет Model в BatchScheduler и process.
+    """
+    candidate_path = settings.MODEL_CANDIDATE_PATH if candidate else ""
+    registry = ModelRegistry(
+        model_path,
+        lambda path: load_model(path, species.encoder() if species is not None else None),
+        candidate_path or None,
+        settings.MODEL_CANDIDATE_PERCENT / 100,
+    )
+    if settings.MODEL_WATCH_INTERVAL > 0:
+        registry.start(settings.MODEL_WATCH_INTERVAL)
+    return registry
+
+
+def declared_species(model_path: str = None) -> dict:
+    """Виды животных: лошадь с моделью model_path и виды из settings.SPECIES_PATH;
+
+    Args:
+        model_path (str): модель лошади, None -- settings.MODEL_PATH;
+
+    Returns:
+        dict: {название: Species}.
+    """
+    species = {HORSE: Species(HORSE, "лошадь", model_path or settings.MODEL_PATH)}
+    if settings.SPECIES_PATH:
+        species.update(load_species(settings.SPECIES_PATH, settings.ROOT_DIR))
+    return species
+
+
+def load_pipeline(species: Species) -> BatchScheduler:
+    """Модель вида животного с микро-батчингом запросов к ней;
+
+    A/B-сравнение (MODEL_CANDIDATE_PATH) -- только для вида по умолчанию.
+    """
+    model = create_model(
+        species.model_path, species, species.name == settings.DEFAULT_SPECIES
+    )
+    return BatchScheduler(
+        model, settings.BATCH_MAX_SIZE, settings.BATCH_MAX_WAIT_MS / 1000
+    ).start()
+
+
+def unload_pipeline(scheduler: BatchScheduler) -> None:
+    """Остановка потоков модели, вытесненной из памяти."""
+    scheduler.stop()
+    scheduler.model.stop()
+
+
+def pipeline_gauges(scheduler: BatchScheduler) -> dict:
+    return {**scheduler.gauges(), **scheduler.model.gauges()}
+
+
+def create_species_registry(model_path: str = None) -> SpeciesRegistry:
+    """Модели видов животных, загружаемые при первом запросе, с ограничением памяти;
+
+    Модель вида по умолчанию загружается сразу, чтобы первый запрос не ждал загрузки.
+
+    Args:
+        model_path (str): модель лошади, None -- settings.MODEL_PATH;
+
+    Returns:
+        SpeciesRegistry: BatchScheduler каждого вида, см. make_handler.
+    """
+    registry = SpeciesRegistry(
+        declared_species(model_path),
+        load_pipeline,
+        unload_pipeline,
+        settings.DEFAULT_SPECIES,
+        settings.SPECIES_MEMORY_BUDGET,
+        pipeline_gauges,
+    )
+    registry.get()
+    REGISTRY.register_collector(registry.gauges)
+    return registry
+
+
+def create_audit_log() -> AuditLog:
+    """Журнал рекомендаций согласно settings, None -- если журнал не ведется.
+
+    Оставшиеся в очереди записи сбрасываются на диск при завершении процесса.
+    """
+    if not settings.AUDIT_DIR:
+        return None
+    audit = AuditLog(
+        settings.AUDIT_DIR,
+        settings.AUDIT_MAX_BYTES,
+        settings.AUDIT_MAX_AGE,
+        settings.AUDIT_FLUSH_INTERVAL,
+        settings.AUDIT_MAX_PENDING,
+    )
+    atexit.register(audit.close)
+    REGISTRY.register_collector(audit.gauges)
+    return audit
+
+
+def make_handler(species: SpeciesRegistry) -> Callable[[str, str], str]:
+    """Обработчик сообщений;
+
+    Сообщение отправляется в модель своего вида животного, одновременные запросы
+    отправляются в модель батчами, рекомендации записываются в журнал (create_audit_log).
+
+    Args:
+        species (SpeciesRegistry): модели видов животных, см. create_species_registry;
+
+    Returns:
+        Callable[[str, str], str]: обработчик текста и вида животного
+                                   (None -- вид по умолчанию), возвращающий сообщение-ответ.
+    """
+    audit = create_audit_log()
+
+    def handler(text: str, name: str = None) -> str:
+        name = species.resolve(name)
+        with species.use(name) as scheduler:
+            return process(
+                scheduler,
+                text,
+                settings.EXPLAIN_TOP,
+                settings.EXPLAIN_APPROXIMATE,
+                audit,
+                name,
+            )
+
+    return handler
+
+
+def run_queue_worker(model_path: str, requests, results, threads: int) -> None:
+    """Точка входа дочернего процесса инференса (транспорт local)."""
+    # метрики дочерних процессов собираются, но не выгружаются:
+    # у всех процессов был бы один адрес эндпоинта
+    REGISTRY.enabled = settings.METRICS_ENABLED
+    serve_queue(
+        make_handler(create_species_registry(model_path)), requests, results, threads
+    )
+
+
+def start_local_workers(model_path: str, workers: int, threads: int = 8) -> QueueClient:
+    """Запуск процессов инференса на этой машине;
+
+    Процессы читают запросы из общей очереди, поэтому нагрузка
+    распределяется между ними сама собой.
+
+    Args:
+        model_path (str): путь к модели лошади, модели остальных видов -- из settings;
+        workers (int): число процессов;
+        threads (int): число потоков-обработчиков в каждом процессе;
+
+    Returns:
+        QueueClient: клиент для отправки сообщений в процессы инференса.
+    """
+    context = multiprocessing.get_context("spawn")
+    requests, results = context.Queue(), context.Queue()
+    for i in range(workers):
+        context.Process(
+            target=run_queue_worker,
+            args=(model_path, requests, results, threads),
+            name=f"inference-worker-{i}",
+            daemon=True,
+        ).start()
+    return QueueClient(requests, results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference service")
+    parser.add_argument("--address", default=settings.INFERENCE_ADDRESS)
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="model of the horse")
+    parser.add_argument("--threads", type=int, default=settings.BOT_NUM_THREADS)
+    args = parser.parse_args()
+
+    setup_monitoring()
+    handler = make_handler(create_species_registry(args.model))
+    server = SocketServer(args.address, handler, args.threads)
+    print(f"Inference service started on {args.address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()